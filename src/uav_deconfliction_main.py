@@ -5,13 +5,21 @@ Main module for drone flight path conflict detection
 
 import numpy as np
 from dataclasses import dataclass
-from typing import List, Tuple, Optional, Dict
+from typing import List, Tuple, Optional, Dict, Union, NamedTuple
 from datetime import datetime, timedelta
 import json
+from bisect import bisect_left
+from collections.abc import Sequence
+from functools import lru_cache
+from math import sqrt
 
-@dataclass
-class Waypoint:
-    """Represents a waypoint in 3D space"""
+from uav_kernels import any_within, dist2, find_conflicts
+
+# Mission fields the cached trajectory geometry is derived from
+_GEOMETRY_FIELDS = frozenset(('waypoints', 'start_time', 'end_time'))
+
+class Waypoint(NamedTuple):
+    """Represents a waypoint in 3D space (an immutable (x, y, z) tuple)"""
     x: float
     y: float
     z: float = 0.0  # Altitude (0 for 2D mode)
@@ -21,28 +29,206 @@ class Waypoint:
     
     def distance_to(self, other: 'Waypoint') -> float:
         """Calculate Euclidean distance to another waypoint"""
-        return np.linalg.norm(self.to_array() - other.to_array())
+        dx = self.x - other.x
+        dy = self.y - other.y
+        dz = self.z - other.z
+        return sqrt(dx * dx + dy * dy + dz * dz)
 
 @dataclass
 class Mission:
-    """Represents a drone mission with waypoints and time window"""
+    """
+    Represents a drone mission with waypoints and time window
+    
+    waypoints may be given as a sequence of Waypoint or as an (N, 3) / (N, 2)
+    array of coordinates; either way it is exposed as a tuple of Waypoint.
+    
+    Derived geometry is cached at construction, so one Mission can be shared
+    between systems and checks. The tuple cannot be edited in place, and
+    assigning waypoints, start_time or end_time rebuilds the cache.
+    """
     drone_id: str
-    waypoints: List[Waypoint]
+    waypoints: Union[List[Waypoint], np.ndarray]
     start_time: float  # Unix timestamp or relative time
     end_time: float
     speed: float = 10.0  # meters per second
     
+    def __post_init__(self):
+        self._prepare()
+    
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        # The cached geometry depends on these; skip during __init__, before
+        # __post_init__ has built it
+        if name in _GEOMETRY_FIELDS and '_wp' in self.__dict__:
+            self._prepare()
+    
+    @staticmethod
+    def _coords_from_array(array: np.ndarray) -> np.ndarray:
+        """Normalize an (N, 3) or (N, 2) coordinate array to contiguous (N, 3) float64"""
+        coords = np.asarray(array, dtype=np.float64)
+        if coords.ndim != 2 or coords.shape[1] not in (2, 3):
+            raise ValueError(f"waypoint array must have shape (N, 3) or (N, 2), got {coords.shape}")
+        if coords.shape[1] == 2:
+            # 2D mode: altitude 0, as with Waypoint(x, y)
+            coords = np.column_stack((coords, np.zeros(len(coords))))
+        return np.ascontiguousarray(coords)
+    
+    def _prepare(self):
+        """
+        Normalize waypoints to a tuple of Waypoint and cache the per-mission
+        invariants used by the interpolation hot paths
+        
+        Runs at construction and whenever a field the cache depends on is
+        assigned.
+        """
+        if isinstance(self.waypoints, np.ndarray):
+            coords = self._coords_from_array(self.waypoints)
+            waypoints = tuple(Waypoint(*row) for row in coords.tolist())
+        else:
+            waypoints = tuple(self.waypoints)
+            coords = np.array(waypoints, dtype=np.float64).reshape(-1, 3)
+        # Stored directly: assigning through __setattr__ would recurse
+        self.__dict__['waypoints'] = waypoints
+        
+        # Structure-of-arrays copy of the waypoints plus segment geometry;
+        # waypoints stays the public tuple view. The copy is read-only, so
+        # neither the caller's array nor coords_array can drift from the cache
+        self._wp = np.array(coords)
+        self._wp.setflags(write=False)
+        self._seg_len = np.linalg.norm(np.diff(self._wp, axis=0), axis=1)
+        self._cum_len = np.concatenate(([0.0], np.cumsum(self._seg_len)))
+        self._total_dist = float(self._cum_len[-1])
+        
+        # Plain-float copies for the scalar interpolation path
+        self._wp_list = self._wp.tolist()
+        self._cum_list = self._cum_len.tolist()
+        
+        # Axis-aligned bounding box of the whole path (empty box if no waypoints)
+        if len(self._wp):
+            self._aabb_min = self._wp.min(axis=0)
+            self._aabb_max = self._wp.max(axis=0)
+        else:
+            self._aabb_min = np.full(3, np.inf)
+            self._aabb_max = np.full(3, -np.inf)
+        self._aabb_min.setflags(write=False)
+        self._aabb_max.setflags(write=False)
+        
+        # Constant-altitude missions allow a 2D distance kernel
+        self._is_planar = bool(len(self._wp)) and bool(np.all(self._wp[:, 2] == self._wp[0, 2]))
+        self._z = float(self._wp[0, 2]) if self._is_planar else None
+        
+        # Distance covered per second at constant speed (0 for zero-duration missions)
+        self._duration = self.end_time - self.start_time
+        self._dist_rate = self._total_dist / self._duration if self._duration > 0 else 0.0
+        
+        # Straight A->B flights (the common case) interpolate on time alone:
+        # (x1, y1, z1, dx, dy, dz) when the drone actually moves, else None
+        if len(self._wp) == 2 and self._duration > 0 and self._total_dist > 0:
+            self._line = tuple(self._wp[0].tolist() + (self._wp[1] - self._wp[0]).tolist())
+        else:
+            self._line = None
+        
+        # Constant-velocity pieces of the trajectory: p(t) = p0 + vel * (t - t0) on [t0, t1]
+        if len(self._wp) == 0 or self._duration < 0:
+            self._seg_p0 = np.empty((0, 3))
+            self._seg_vel = np.empty((0, 3))
+            self._seg_t0 = np.empty(0)
+            self._seg_t1 = np.empty(0)
+        elif self._duration == 0 or self._total_dist == 0:
+            # Stationary for the whole window (same point interpolation reports)
+            anchor = self._wp[0] if self._duration == 0 else self._wp[-1]
+            self._seg_p0 = anchor[None].copy()
+            self._seg_vel = np.zeros((1, 3))
+            self._seg_t0 = np.array([self.start_time], dtype=np.float64)
+            self._seg_t1 = np.array([self.end_time], dtype=np.float64)
+        else:
+            moving = self._seg_len > 0
+            arrival = self.start_time + self._cum_len / self._dist_rate
+            self._seg_t0 = arrival[:-1][moving]
+            self._seg_t1 = arrival[1:][moving]
+            self._seg_p0 = self._wp[:-1][moving]
+            self._seg_vel = (np.diff(self._wp, axis=0)[moving]
+                             / (self._seg_t1 - self._seg_t0)[:, None])
+    
+    @property
+    def coords_array(self) -> np.ndarray:
+        """Waypoints as a read-only contiguous (N, 3) float64 array, kept in step with waypoints"""
+        return self._wp
+    
+    @property
+    def bounds(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Axis-aligned bounding box of the waypoints, kept in step with waypoints
+        
+        Returns:
+            Tuple of (min corner, max corner) as read-only (3,) arrays; an
+            empty path gives (inf, inf, inf) and (-inf, -inf, -inf)
+        """
+        return self._aabb_min, self._aabb_max
+    
     def duration(self) -> float:
         return self.end_time - self.start_time
     
     def total_distance(self) -> float:
         """Calculate total mission distance"""
-        distance = 0.0
-        for i in range(len(self.waypoints) - 1):
-            distance += self.waypoints[i].distance_to(self.waypoints[i + 1])
-        return distance
+        return self._total_dist
+    
+    def sample_trajectory(self, times: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Sample drone positions at many times in one vectorized pass
+        
+        Args:
+            times: 1-D array of query times
+            out: Optional (N, 3) float64 array to write the positions into
+            
+        Returns:
+            (N, 3) float64 array of positions; rows are NaN where the drone
+            is not flying at that time
+        """
+        times = np.asarray(times, dtype=np.float64)
+        if out is None:
+            positions = np.full((times.shape[0], 3), np.nan)
+        else:
+            positions = out
+            positions.fill(np.nan)
+        if len(self._wp) == 0:
+            return positions
+        
+        wp = self._wp
+        active = (times >= self.start_time) & (times <= self.end_time)
+        
+        # Hovering or zero-duration missions sit on a single point
+        if self._duration == 0 or self._total_dist == 0:
+            positions[active] = wp[0] if self._duration == 0 else wp[-1]
+            return positions
+        
+        # Single segment: position is linear in time
+        if self._line is not None:
+            frac = (times[active] - self.start_time) / self._duration
+            positions[active] = wp[0] + frac[:, None] * (wp[1] - wp[0])
+            return positions
+        
+        # Constant speed along the path: time maps linearly to distance
+        distance_traveled = np.minimum((times[active] - self.start_time) * self._dist_rate,
+                                       self._total_dist)
+        seg_idx = self._segment_index(distance_traveled)
+        
+        # Gathered linear interpolation (zero-length segments stay at their start)
+        lengths = self._seg_len[seg_idx]
+        safe_lengths = np.where(lengths > 0, lengths, 1.0)
+        frac = np.where(lengths > 0, (distance_traveled - self._cum_len[seg_idx]) / safe_lengths, 0.0)
+        p1 = wp[seg_idx]
+        p2 = wp[seg_idx + 1]
+        positions[active] = p1 + frac[:, None] * (p2 - p1)
+        
+        return positions
+    
+    def _segment_index(self, distance_traveled):
+        """Index of the first segment whose far end reaches the travelled distance"""
+        seg_idx = np.searchsorted(self._cum_len, distance_traveled, side='left') - 1
+        return np.clip(seg_idx, 0, len(self._seg_len) - 1)
 
-@dataclass
+@dataclass(slots=True)
 class Conflict:
     """Represents a detected conflict between drones"""
     primary_drone: str
@@ -52,6 +238,60 @@ class Conflict:
     distance: float
     description: str
 
+# Columnar layout for detected conflicts: flight index, time, distance, primary position
+CONFLICT_DTYPE = np.dtype([('sim', 'i4'), ('t', 'f8'), ('d', 'f8'), ('p', '3f8')])
+
+class ConflictSet(Sequence):
+    """
+    Conflicts kept as a structured NumPy array during detection
+    
+    Behaves like a read-only list of Conflict objects, but the objects are
+    only built when a consumer indexes or iterates the set.
+    """
+    
+    def __init__(self, records: np.ndarray, primary_drone: str,
+                 drone_ids: List[str], safety_buffer: float):
+        """
+        Args:
+            records: Structured array with CONFLICT_DTYPE
+            primary_drone: ID of the mission that was verified
+            drone_ids: Conflicting drone ID for each value of records['sim']
+            safety_buffer: Buffer used for the check (for descriptions)
+        """
+        self.records = records
+        self.primary_drone = primary_drone
+        self.drone_ids = drone_ids
+        self.safety_buffer = safety_buffer
+        self._conflicts: Optional[List[Conflict]] = None
+    
+    def __len__(self) -> int:
+        return len(self.records)
+    
+    def __getitem__(self, index):
+        return self.to_conflict_list()[index]
+    
+    def __iter__(self):
+        return iter(self.to_conflict_list())
+    
+    def to_conflict_list(self) -> List[Conflict]:
+        """Materialize (once) and return the conflicts as Conflict objects"""
+        if self._conflicts is None:
+            self._conflicts = [
+                Conflict(
+                    primary_drone=self.primary_drone,
+                    conflicting_drone=self.drone_ids[sim_idx],
+                    location=Waypoint(x, y, z),
+                    time=t,
+                    distance=distance,
+                    description=f"Conflict at t={t:.1f}s: distance={distance:.2f}m (min={self.safety_buffer}m)"
+                )
+                for sim_idx, t, distance, (x, y, z) in zip(
+                    self.records['sim'].tolist(), self.records['t'].tolist(),
+                    self.records['d'].tolist(), self.records['p'].tolist()
+                )
+            ]
+        return self._conflicts
+
 class DeconflictionSystem:
     """
     Strategic deconfliction system for UAV flight path verification
@@ -68,6 +308,13 @@ class DeconflictionSystem:
         self.safety_buffer = safety_buffer
         self.time_resolution = time_resolution
         self.simulated_flights: List[Mission] = []
+        
+        # Scratch buffers reused across verify_mission calls of the same size
+        # (a system instance should not verify from several threads at once)
+        self._time_key = None
+        self._time_buf: Optional[np.ndarray] = None
+        self._index_buf: Optional[np.ndarray] = None
+        self._primary_pos_buf: Optional[np.ndarray] = None
     
     def add_simulated_flight(self, mission: Mission):
         """Add a simulated flight to the airspace"""
@@ -84,113 +331,385 @@ class DeconflictionSystem:
         Returns:
             Interpolated position or None if drone not flying at that time
         """
+        xyz = self._interpolate_position_xyz(mission, time)
+        if xyz is None:
+            return None
+        return Waypoint(*xyz)
+    
+    def interpolate_positions(self, mission: Mission, times) -> np.ndarray:
+        """
+        Interpolate drone positions at many times in one vectorized call
+        
+        Args:
+            mission: Drone mission
+            times: 1-D array of query times
+            
+        Returns:
+            (N, 3) array of positions; rows are NaN where the drone is not flying
+        """
+        return mission.sample_trajectory(np.asarray(times, dtype=np.float64))
+    
+    def _interpolate_position_xyz(self, mission: Mission,
+                                  time: float) -> Optional[Tuple[float, float, float]]:
+        """Same as interpolate_position, but returns a plain (x, y, z) tuple"""
         if time < mission.start_time or time > mission.end_time:
             return None
         
-        # Calculate progress through mission
-        elapsed = time - mission.start_time
-        total_duration = mission.duration()
+        if not mission.waypoints:
+            return None
+        if mission._duration == 0:
+            return tuple(mission._wp_list[0])
+        if mission._total_dist == 0:
+            return tuple(mission._wp_list[-1])
+        
+        # Single segment: position is linear in time
+        if mission._line is not None:
+            alpha = (time - mission.start_time) / mission._duration
+            x1, y1, z1, dx, dy, dz = mission._line
+            return (x1 + alpha * dx, y1 + alpha * dy, z1 + alpha * dz)
         
-        if total_duration == 0:
-            return mission.waypoints[0] if mission.waypoints else None
+        # Calculate distance traveled at constant speed
+        distance_traveled = min((time - mission.start_time) * mission._dist_rate,
+                                mission._total_dist)
         
-        # Calculate total distance and distance traveled
-        total_distance = mission.total_distance()
-        distance_traveled = (elapsed / total_duration) * total_distance
+        # Find which segment the drone is on (scalar bisect; no ndarray temporaries)
+        cum_len = mission._cum_list
+        i = min(max(bisect_left(cum_len, distance_traveled) - 1, 0), len(cum_len) - 2)
+        segment_distance = cum_len[i + 1] - cum_len[i]
+        segment_progress = 0.0
+        if segment_distance > 0:
+            segment_progress = (distance_traveled - cum_len[i]) / segment_distance
         
-        # Find which segment the drone is on
-        cumulative_distance = 0.0
-        for i in range(len(mission.waypoints) - 1):
-            segment_distance = mission.waypoints[i].distance_to(mission.waypoints[i + 1])
-            
-            if cumulative_distance + segment_distance >= distance_traveled:
-                # Drone is on this segment
-                segment_progress = (distance_traveled - cumulative_distance) / segment_distance
-                
-                # Linear interpolation
-                p1 = mission.waypoints[i].to_array()
-                p2 = mission.waypoints[i + 1].to_array()
-                pos = p1 + segment_progress * (p2 - p1)
-                
-                return Waypoint(pos[0], pos[1], pos[2])
+        # Linear interpolation on plain floats
+        x1, y1, z1 = mission._wp_list[i]
+        x2, y2, z2 = mission._wp_list[i + 1]
+        return (x1 + segment_progress * (x2 - x1),
+                y1 + segment_progress * (y2 - y1),
+                z1 + segment_progress * (z2 - z1))
+    
+    def _broadphase(self, primary_mission: Mission, flights: List[Mission]) -> List[Mission]:
+        """
+        Cheap broadphase run before sampling any simulated flight
+        
+        Drops flights whose time window is disjoint from the primary's, or
+        whose bounding box is at least one safety buffer away on some axis.
+        
+        Returns:
+            The flights that may conflict, in their original order
+        """
+        if not flights:
+            return []
+        
+        windows = np.array([(f.start_time, f.end_time) for f in flights], dtype=np.float64)
+        boxes = np.array([(f._aabb_min, f._aabb_max) for f in flights])
+        
+        overlap = (windows[:, 1] >= primary_mission.start_time) & (windows[:, 0] <= primary_mission.end_time)
+        near = np.all(boxes[:, 0] - primary_mission._aabb_max < self.safety_buffer, axis=1)
+        near &= np.all(primary_mission._aabb_min - boxes[:, 1] < self.safety_buffer, axis=1)
+        return [flights[i] for i in np.flatnonzero(overlap & near)]
+    
+    def closest_approach(self, primary_mission: Mission,
+                         sim_flight: Mission) -> Optional[Tuple[float, float]]:
+        """
+        Exact minimum separation between two missions over continuous time
+        
+        Both trajectories are piecewise constant-velocity, so for every pair of
+        simultaneously active segments the squared separation is a quadratic in
+        time and its minimum has a closed form.
+        
+        Args:
+            primary_mission: The mission being verified
+            sim_flight: Simulated flight to compare against
             
-            cumulative_distance += segment_distance
+        Returns:
+            Tuple of (min_distance, time_of_min), or None if the drones are
+            never airborne at the same time
+        """
+        p_t0 = primary_mission._seg_t0[:, None]
+        p_t1 = primary_mission._seg_t1[:, None]
+        q_t0 = sim_flight._seg_t0[None, :]
+        q_t1 = sim_flight._seg_t1[None, :]
         
-        # Return last waypoint if we've completed the mission
-        return mission.waypoints[-1] if mission.waypoints else None
+        # Common active interval of every (primary segment, sim segment) pair
+        lo = np.maximum(p_t0, q_t0)
+        hi = np.minimum(p_t1, q_t1)
+        overlap = lo <= hi
+        if not overlap.any():
+            return None
+        
+        # Relative position at the start of the interval and relative velocity
+        p_vel = primary_mission._seg_vel[:, None, :]
+        q_vel = sim_flight._seg_vel[None, :, :]
+        w_lo = ((primary_mission._seg_p0[:, None, :] + p_vel * (lo - p_t0)[..., None])
+                - (sim_flight._seg_p0[None, :, :] + q_vel * (lo - q_t0)[..., None]))
+        dv = p_vel - q_vel
+        
+        # Minimize |w_lo + dv * s|^2 for s in [0, hi - lo]
+        dv_sq = np.einsum('ijk,ijk->ij', dv, dv)
+        w_dv = np.einsum('ijk,ijk->ij', w_lo, dv)
+        s = np.divide(-w_dv, dv_sq, out=np.zeros_like(dv_sq), where=dv_sq > 0)
+        s = np.clip(s, 0.0, np.maximum(hi - lo, 0.0))
+        
+        w = w_lo + dv * s[..., None]
+        sq_dist = np.einsum('ijk,ijk->ij', w, w)
+        sq_dist[~overlap] = np.inf
+        
+        best = np.unravel_index(np.argmin(sq_dist), sq_dist.shape)
+        return float(np.sqrt(sq_dist[best])), float(lo[best] + s[best])
     
     def check_spatial_conflict(self, pos1: Waypoint, pos2: Waypoint) -> bool:
         """Check if two positions violate safety buffer"""
-        return pos1.distance_to(pos2) < self.safety_buffer
+        # Compare squared distances; no sqrt needed for a yes/no answer
+        return dist2(pos1.x, pos1.y, pos1.z, pos2.x, pos2.y, pos2.z) < self.safety_buffer * self.safety_buffer
     
-    def verify_mission(self, primary_mission: Mission) -> Tuple[bool, List[Conflict]]:
+    def verify_mission(self, primary_mission: Mission,
+                       max_conflicts: Optional[int] = None) -> Tuple[bool, ConflictSet]:
         """
         Verify if a mission is safe to execute
         
         Args:
             primary_mission: The mission to verify
+            max_conflicts: Stop once this many conflicts are recorded (None
+                reports all of them; 1 is enough for a yes/no answer)
             
         Returns:
-            Tuple of (is_safe, list_of_conflicts)
+            Tuple of (is_safe, conflicts); conflicts is a ConflictSet, which
+            behaves like a list of Conflict objects ordered by flight and time
+        
+        Raises:
+            ValueError: If max_conflicts is given and is less than 1
         """
-        conflicts = []
+        if max_conflicts is not None and max_conflicts < 1:
+            raise ValueError(f"max_conflicts must be at least 1, got {max_conflicts}")
+        
+        # Broadphase: drop flights that cannot come within the buffer
+        candidates = self._broadphase(primary_mission, self.simulated_flights)
+        
+        # Narrowphase: exact closest approach; only flights that really get
+        # inside the buffer are sampled (tiny slack keeps borderline samples)
+        approaches = [self.closest_approach(primary_mission, sim_flight) for sim_flight in candidates]
+        keep = [
+            i for i, approach in enumerate(approaches)
+            if approach is not None and approach[0] < self.safety_buffer * (1 + 1e-9)
+        ]
+        candidates = [candidates[i] for i in keep]
+        approaches = [approaches[i] for i in keep]
+        if not candidates:
+            return True, self._conflict_set(primary_mission, candidates, np.empty(0, CONFLICT_DTYPE))
         
         # Sample time points throughout the mission
         num_samples = int(primary_mission.duration() / self.time_resolution) + 1
-        time_points = np.linspace(
-            primary_mission.start_time,
-            primary_mission.end_time,
-            num_samples
-        )
+        time_points = self._time_grid(primary_mission.start_time, primary_mission.end_time, num_samples)
+        
+        # The primary is sampled once and shared by every flight's scan
+        if self._primary_pos_buf is None or len(self._primary_pos_buf) != num_samples:
+            self._primary_pos_buf = np.empty((num_samples, 3))
+        primary_positions = primary_mission.sample_trajectory(time_points, out=self._primary_pos_buf)
+        
+        # When every mission flies at the same altitude the z term is
+        # identically zero and the scan skips it
+        planar = self._all_coplanar(primary_mission, candidates)
+        
+        # A yes/no query only needs the first conflict of the first flight
+        # that has one
+        if max_conflicts == 1:
+            for k, (sim_flight, approach) in enumerate(zip(candidates, approaches)):
+                records = self._first_conflict(primary_mission, primary_positions, time_points,
+                                               sim_flight, approach)
+                if len(records):
+                    records['sim'] = k
+                    return False, self._conflict_set(primary_mission, candidates, records)
+            return True, self._conflict_set(primary_mission, candidates, np.empty(0, CONFLICT_DTYPE))
         
-        # Check against each simulated flight
-        for sim_flight in self.simulated_flights:
-            for t in time_points:
-                # Get positions at time t
-                primary_pos = self.interpolate_position(primary_mission, t)
-                sim_pos = self.interpolate_position(sim_flight, t)
-                
-                if primary_pos is None or sim_pos is None:
-                    continue
-                
-                # Check for spatial conflict
-                distance = primary_pos.distance_to(sim_pos)
-                if distance < self.safety_buffer:
-                    conflict = Conflict(
-                        primary_drone=primary_mission.drone_id,
-                        conflicting_drone=sim_flight.drone_id,
-                        location=primary_pos,
-                        time=t,
-                        distance=distance,
-                        description=f"Conflict at t={t:.1f}s: distance={distance:.2f}m (min={self.safety_buffer}m)"
-                    )
-                    conflicts.append(conflict)
+        # Every surviving candidate conflicts at least once, so with a cap only
+        # the first few flights need scanning; stop as soon as the cap is met
+        chunks = []
+        found = 0
+        start = 0
+        while start < len(candidates):
+            if max_conflicts is None:
+                stop = len(candidates)
+            else:
+                if found >= max_conflicts:
+                    break
+                stop = start + max(max_conflicts - found, 1)
+            
+            records = self._scan_candidates(
+                primary_mission, primary_positions, time_points,
+                candidates[start:stop], approaches[start:stop], planar
+            )
+            records['sim'] += start
+            chunks.append(records)
+            found += len(records)
+            start = stop
+        
+        records = np.concatenate(chunks)[:max_conflicts]
+        conflicts = self._conflict_set(primary_mission, candidates, records)
         
         return len(conflicts) == 0, conflicts
     
+    def _first_conflict(self, primary_mission: Mission, primary_positions: np.ndarray,
+                        time_points: np.ndarray, sim_flight: Mission,
+                        approach: Tuple[float, float]) -> np.ndarray:
+        """Earliest conflict record of one candidate flight (empty if it has none)"""
+        sim_positions = sim_flight.sample_trajectory(time_points)
+        i = any_within(primary_positions, sim_positions, self.safety_buffer * self.safety_buffer)
+        
+        if i < 0 and not approach[0] < self.safety_buffer:
+            # Survived the narrowphase slack but never gets inside the buffer
+            return np.empty(0, dtype=CONFLICT_DTYPE)
+        
+        records = np.empty(1, dtype=CONFLICT_DTYPE)
+        if i >= 0:
+            records['t'] = time_points[i]
+            records['d'] = np.linalg.norm(sim_positions[i] - primary_positions[i])
+            records['p'] = primary_positions[i]
+        else:
+            # Conflict falls between two samples
+            records['t'] = approach[1]
+            records['d'] = approach[0]
+            records['p'] = primary_mission.sample_trajectory([approach[1]])
+        records['sim'] = 0
+        return records
+    
+    def _scan_candidates(self, primary_mission: Mission, primary_positions: np.ndarray,
+                         time_points: np.ndarray, candidates: List[Mission],
+                         approaches: List[Tuple[float, float]], planar: bool) -> np.ndarray:
+        """Conflict records (CONFLICT_DTYPE) of a group of candidate flights"""
+        # Every (simulated flight, sample) pair inside the buffer; square
+        # roots are only taken for the hits
+        hit_sims, hit_t_idx, hit_sq_dists = find_conflicts(
+            primary_positions, candidates, time_points, self.safety_buffer, planar
+        )
+        hit_times = time_points[hit_t_idx]
+        hit_distances = np.sqrt(hit_sq_dists)
+        hit_positions = primary_positions[hit_t_idx]
+        
+        # A conflict that falls between two samples is reported at the exact
+        # time of closest approach
+        missed = [
+            i for i, (distance, _) in enumerate(approaches)
+            if distance < self.safety_buffer and not np.any(hit_sims == i)
+        ]
+        if missed:
+            hit_sims = np.concatenate((hit_sims, missed))
+            hit_times = np.concatenate((hit_times, [approaches[i][1] for i in missed]))
+            hit_distances = np.concatenate((hit_distances, [approaches[i][0] for i in missed]))
+            hit_positions = np.concatenate((
+                hit_positions,
+                primary_mission.sample_trajectory([approaches[i][1] for i in missed])
+            ))
+            order = np.lexsort((hit_times, hit_sims))
+            hit_sims, hit_times = hit_sims[order], hit_times[order]
+            hit_distances, hit_positions = hit_distances[order], hit_positions[order]
+        
+        # Record hits column-wise; Conflict objects are built only on demand
+        records = np.empty(len(hit_sims), dtype=CONFLICT_DTYPE)
+        records['sim'] = hit_sims
+        records['t'] = hit_times
+        records['d'] = hit_distances
+        records['p'] = hit_positions
+        return records
+    
+    def _all_coplanar(self, primary_mission: Mission, candidates: List[Mission]) -> bool:
+        """True when the primary and every candidate fly at one common altitude"""
+        if not primary_mission._is_planar:
+            return False
+        return all(
+            sim_flight._is_planar and abs(sim_flight._z - primary_mission._z) <= 1e-9
+            for sim_flight in candidates
+        )
+    
+    def _time_grid(self, start: float, end: float, num_samples: int) -> np.ndarray:
+        """
+        Evenly spaced samples over [start, end], equal to np.linspace, written
+        into a buffer that is reused while the sample count stays the same
+        """
+        key = (start, end, num_samples)
+        if key == self._time_key:
+            return self._time_buf
+        
+        if self._time_buf is None or len(self._time_buf) != num_samples:
+            self._time_buf = np.empty(num_samples)
+            self._index_buf = np.arange(num_samples, dtype=np.float64)
+        
+        # Same arithmetic as np.linspace: index * step + start, exact endpoint
+        if num_samples > 1:
+            np.multiply(self._index_buf, (end - start) / (num_samples - 1), out=self._time_buf)
+            self._time_buf += start
+            self._time_buf[-1] = end
+        else:
+            self._time_buf[0] = start
+        self._time_key = key
+        return self._time_buf
+    
+    def _conflict_set(self, primary_mission: Mission, candidates: List[Mission],
+                      records: np.ndarray) -> ConflictSet:
+        """Wrap conflict records with the IDs needed to materialize them"""
+        return ConflictSet(
+            records,
+            primary_drone=primary_mission.drone_id,
+            drone_ids=[sim_flight.drone_id for sim_flight in candidates],
+            safety_buffer=self.safety_buffer
+        )
+    
     def get_conflict_summary(self, conflicts: List[Conflict]) -> str:
         """Generate human-readable conflict summary"""
         if not conflicts:
             return "✓ Mission APPROVED: No conflicts detected"
         
-        summary = f"✗ Mission DENIED: {len(conflicts)} conflict(s) detected\n\n"
-        
-        # Group conflicts by drone
-        conflicts_by_drone = {}
-        for conflict in conflicts:
-            if conflict.conflicting_drone not in conflicts_by_drone:
-                conflicts_by_drone[conflict.conflicting_drone] = []
-            conflicts_by_drone[conflict.conflicting_drone].append(conflict)
+        # Only the shown fields go into the key, so equal reports share one string
+        return _format_conflict_summary(len(conflicts), self._summary_key(conflicts))
+    
+    @staticmethod
+    def _summary_key(conflicts: List[Conflict]) -> Tuple:
+        """
+        Group conflicts by drone for the summary
         
-        for drone_id, drone_conflicts in conflicts_by_drone.items():
-            summary += f"Conflicts with {drone_id}:\n"
-            for i, c in enumerate(drone_conflicts[:3], 1):  # Show first 3
-                summary += f"  {i}. Time: {c.time:.1f}s, Location: ({c.location.x:.1f}, {c.location.y:.1f}, {c.location.z:.1f}), Distance: {c.distance:.2f}m\n"
-            if len(drone_conflicts) > 3:
-                summary += f"  ... and {len(drone_conflicts) - 3} more conflicts\n"
-            summary += "\n"
+        Returns:
+            Tuple of (drone_id, conflict count, first three (time, x, y, z,
+            distance) rows) per drone, in order of first appearance
+        """
+        groups: Dict[str, list] = {}
+        if isinstance(conflicts, ConflictSet):
+            # Records are sorted by flight, so each flight is one contiguous run;
+            # read the shown rows straight from the array
+            records = conflicts.records
+            sims = records['sim']
+            bounds = np.flatnonzero(np.diff(sims)) + 1
+            for lo, hi in zip(np.concatenate(([0], bounds)).tolist(),
+                              np.concatenate((bounds, [len(sims)])).tolist()):
+                group = groups.setdefault(conflicts.drone_ids[sims[lo]], [0, []])
+                group[0] += hi - lo
+                shown = records[lo:min(hi, lo + 3)]
+                group[1].extend(
+                    (t, x, y, z, d) for t, (x, y, z), d in zip(
+                        shown['t'].tolist(), shown['p'].tolist(), shown['d'].tolist())
+                )
+        else:
+            for c in conflicts:
+                group = groups.setdefault(c.conflicting_drone, [0, []])
+                group[0] += 1
+                group[1].append((c.time, c.location.x, c.location.y, c.location.z, c.distance))
         
-        return summary.strip()
+        return tuple(
+            (drone_id, count, tuple(rows[:3])) for drone_id, (count, rows) in groups.items()
+        )
+
+
+@lru_cache(maxsize=128)
+def _format_conflict_summary(total: int, groups: Tuple) -> str:
+    """Format a conflict summary from DeconflictionSystem._summary_key groups"""
+    lines = [f"✗ Mission DENIED: {total} conflict(s) detected", ""]
+    for drone_id, count, rows in groups:
+        lines.append(f"Conflicts with {drone_id}:")
+        for i, (t, x, y, z, d) in enumerate(rows, 1):  # Show first 3
+            lines.append(f"  {i}. Time: {t:.1f}s, Location: ({x:.1f}, {y:.1f}, {z:.1f}), Distance: {d:.2f}m")
+        if count > 3:
+            lines.append(f"  ... and {count - 3} more conflicts")
+        lines.append("")
+    
+    return "\n".join(lines).strip()
 
 
 def create_sample_scenario() -> Tuple[Mission, DeconflictionSystem]:
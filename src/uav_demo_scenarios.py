@@ -3,7 +3,11 @@ Demo script showcasing various deconfliction scenarios
 Generates visualizations and detailed reports
 """
 
+import multiprocessing
+import os
+
 import numpy as np
+import matplotlib.pyplot as plt
 from uav_deconfliction_main import (
     Waypoint, Mission, DeconflictionSystem
 )
@@ -268,8 +272,8 @@ class ScenarioGenerator:
         return primary, system
 
 
-def run_scenario(scenario_func, scenario_num: int, generate_viz: bool = True):
-    """Run a scenario and generate output"""
+def run_scenario(scenario_func, scenario_num: int):
+    """Run a scenario's verification and report; rendering is left to render_scenario"""
     
     # Generate scenario
     primary, system = scenario_func()
@@ -288,41 +292,62 @@ def run_scenario(scenario_func, scenario_num: int, generate_viz: bool = True):
     print(system.get_conflict_summary(conflicts))
     print("-"*70)
     
-    # Generate visualizations
-    if generate_viz:
-        viz = DeconflictionVisualizer(system)
-        
-        print(f"\nGenerating visualizations for Scenario {scenario_num}...")
-        
-        # 2D plot
-        viz.plot_2d_scenario(
-            primary, conflicts,
-            filename=f'scenario_{scenario_num}_2d.png',
-            show=False
-        )
-        print(f"  ✓ 2D visualization saved")
-        
-        # 3D plot
-        viz.plot_3d_scenario(
+    viz_payload = {
+        'scenario': scenario_num,
+        'primary': primary,
+        'system': system,
+        'conflicts': conflicts
+    }
+    return is_safe, conflicts, viz_payload
+
+
+def render_scenario(viz_payload):
+    """Generate the visualizations for one scenario (runs in a worker process)"""
+    
+    # Workers never display figures; keep them off any GUI backend
+    plt.switch_backend('Agg')
+    
+    scenario_num = viz_payload['scenario']
+    primary = viz_payload['primary']
+    conflicts = viz_payload['conflicts']
+    viz = DeconflictionVisualizer(viz_payload['system'])
+    
+    # One figure is reused for all of this scenario's outputs
+    fig = plt.figure()
+    
+    # 2D plot
+    viz.plot_2d_scenario(
+        primary, conflicts,
+        filename=f'scenario_{scenario_num}_2d.png',
+        show=False,
+        fig=fig
+    )
+    print(f"  ✓ Scenario {scenario_num}: 2D visualization saved")
+    
+    # 3D plot
+    viz.plot_3d_scenario(
+        primary, conflicts,
+        filename=f'scenario_{scenario_num}_3d.png',
+        show=False,
+        fig=fig
+    )
+    print(f"  ✓ Scenario {scenario_num}: 3D visualization saved")
+    
+    # 4D animation (only for scenarios with conflicts or interesting dynamics)
+    if scenario_num in [2, 3, 5]:
+        viz.create_4d_animation(
             primary, conflicts,
-            filename=f'scenario_{scenario_num}_3d.png',
-            show=False
+            filename=f'scenario_{scenario_num}_4d.gif',
+            fps=15,
+            fig=fig,
+            hold_static_frames=True
         )
-        print(f"  ✓ 3D visualization saved")
-        
-        # 4D animation (only for scenarios with conflicts or interesting dynamics)
-        if scenario_num in [2, 3, 5]:
-            viz.create_4d_animation(
-                primary, conflicts,
-                filename=f'scenario_{scenario_num}_4d.gif',
-                fps=15
-            )
-            print(f"  ✓ 4D animation saved")
+        print(f"  ✓ Scenario {scenario_num}: 4D animation saved")
     
-    return is_safe, conflicts
+    plt.close('all')
 
 
-def main():
+def main(generate_viz: bool = True):
     """Run all demo scenarios"""
     
     print("="*70)
@@ -340,16 +365,28 @@ def main():
     ]
     
     results = []
+    payloads = []
     
+    # Verification first, so its output and timing are not mixed with rendering
     for scenario_func, num in scenarios:
-        is_safe, conflicts = run_scenario(scenario_func, num, generate_viz=True)
+        is_safe, conflicts, viz_payload = run_scenario(scenario_func, num)
         results.append({
             'scenario': num,
             'safe': is_safe,
             'conflicts': len(conflicts)
         })
+        payloads.append(viz_payload)
         print("\n")
     
+    # Rendering is CPU-bound and independent per scenario: one process each
+    if generate_viz:
+        print("\nGenerating visualizations...")
+        processes = min(os.cpu_count() or 1, len(payloads))
+        # spawn, not fork: the parent already ran Numba's parallel scan, and a
+        # forked child inheriting its (TBB) thread pool hangs at exit
+        with multiprocessing.get_context('spawn').Pool(processes=processes) as pool:
+            pool.map(render_scenario, payloads)
+    
     # Final summary
     print("\n" + "="*70)
     print("DEMONSTRATION COMPLETE - SUMMARY")
@@ -359,8 +396,9 @@ def main():
         status = "✓ APPROVED" if r['safe'] else "✗ DENIED"
         print(f"Scenario {r['scenario']}: {status} ({r['conflicts']} conflicts)")
     
-    print("\nAll visualizations have been generated.")
-    print("Check the current directory for PNG images and GIF animations.")
+    if generate_viz:
+        print("\nAll visualizations have been generated.")
+        print("Check the current directory for PNG images and GIF animations.")
     print("="*70)
 
 
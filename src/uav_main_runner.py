@@ -6,6 +6,24 @@ Provides interactive menu for running different parts of the system
 
 import sys
 import os
+import importlib.util
+import itertools
+from functools import lru_cache
+
+# Heavy modules (NumPy, Matplotlib and the system itself) are only imported
+# once a menu option needs them, and each loader runs at most once
+
+@lru_cache(maxsize=None)
+def _get_core():
+    """Return (Waypoint, Mission, DeconflictionSystem) from the core module"""
+    from uav_deconfliction_main import Waypoint, Mission, DeconflictionSystem
+    return Waypoint, Mission, DeconflictionSystem
+
+@lru_cache(maxsize=None)
+def _get_visualizer():
+    """Return the DeconflictionVisualizer class"""
+    from uav_visualization import DeconflictionVisualizer
+    return DeconflictionVisualizer
 
 def print_banner():
     banner = """
@@ -89,9 +107,7 @@ def run_simple_example():
     print("="*70 + "\n")
     
     try:
-        from uav_deconfliction_main import (
-            Waypoint, Mission, DeconflictionSystem
-        )
+        Waypoint, Mission, DeconflictionSystem = _get_core()
         
         print("Creating deconfliction system...")
         system = DeconflictionSystem(safety_buffer=50.0, time_resolution=1.0)
@@ -126,7 +142,7 @@ def run_simple_example():
         
         if conflicts:
             print("\nGenerating visualization...")
-            from uav_visualization import DeconflictionVisualizer
+            DeconflictionVisualizer = _get_visualizer()
             viz = DeconflictionVisualizer(system)
             viz.plot_2d_scenario(primary, conflicts, filename='simple_example.png', show=False)
             print("✅ Visualization saved as 'simple_example.png'")
@@ -136,37 +152,78 @@ def run_simple_example():
         import traceback
         traceback.print_exc()
 
+def _read_floats(prompt, count):
+    """Read `count` whitespace-separated numbers from a single prompt"""
+    while True:
+        values = input(prompt).replace(',', ' ').split()
+        if len(values) == count:
+            return [float(v) for v in values]
+        print(f"  Please enter {count} numbers separated by spaces.")
+
+def _read_bulk_scenario():
+    """
+    Read a whole scenario pasted at once, ending with a blank line
+    
+    Rows are told apart by how many numbers they hold:
+        x y z                        primary waypoint (in order)
+        start end                    primary mission time window
+        x1 y1 z1 x2 y2 z2 t1 t2      simulated drone flying start -> end
+    
+    Returns:
+        Tuple of (waypoint rows, start time, end time, simulated drone rows)
+    """
+    print("\nPaste the scenario, one row per line, then an empty line:")
+    print("  x y z                     - primary waypoint")
+    print("  start end                 - primary time window")
+    print("  x1 y1 z1 x2 y2 z2 t1 t2   - simulated drone\n")
+    
+    waypoints, window, sims = [], None, []
+    for line in sys.stdin:
+        row = [float(v) for v in line.replace(',', ' ').split()]
+        if not row:
+            break
+        if len(row) == 3:
+            waypoints.append(row)
+        elif len(row) == 2:
+            window = row
+        elif len(row) == 8:
+            sims.append(row)
+        else:
+            raise ValueError(f"Cannot parse row with {len(row)} values: {line.strip()}")
+    
+    if window is None:
+        raise ValueError("Missing 'start end' row for the primary mission")
+    return waypoints, window[0], window[1], sims
+
 def create_custom_scenario():
     print("\n" + "="*70)
     print("CUSTOM SCENARIO BUILDER")
     print("="*70 + "\n")
     
     try:
-        from uav_deconfliction_main import (
-            Waypoint, Mission, DeconflictionSystem
-        )
-        from uav_visualization import DeconflictionVisualizer
+        import numpy as np
+        Waypoint, Mission, DeconflictionSystem = _get_core()
+        DeconflictionVisualizer = _get_visualizer()
         
         print("Let's create a custom scenario!")
-        print("\nPrimary Drone Configuration:")
-        
-        # Get primary mission details
-        num_waypoints = int(input("Number of waypoints (2-10): "))
-        waypoints = []
         
-        for i in range(num_waypoints):
-            print(f"\nWaypoint {i+1}:")
-            x = float(input("  X coordinate (meters): "))
-            y = float(input("  Y coordinate (meters): "))
-            z = float(input("  Z altitude (meters): "))
-            waypoints.append(Waypoint(x, y, z))
-        
-        start_time = float(input("\nMission start time (seconds): "))
-        end_time = float(input("Mission end time (seconds): "))
+        bulk = input("Use bulk paste mode? [y/N]: ").strip().lower() == 'y'
+        if bulk:
+            waypoints, start_time, end_time, sim_rows = _read_bulk_scenario()
+        else:
+            print("\nPrimary Drone Configuration:")
+            
+            # Get primary mission details
+            num_waypoints = int(input("Number of waypoints (2-10): "))
+            waypoints = [
+                _read_floats(f"Waypoint {i+1} - X Y Z (meters): ", 3)
+                for i in range(num_waypoints)
+            ]
+            start_time, end_time = _read_floats("\nMission start and end time (seconds): ", 2)
         
         primary = Mission(
             drone_id="CUSTOM-PRIMARY",
-            waypoints=waypoints,
+            waypoints=np.array(waypoints, dtype=float).reshape(-1, 3),
             start_time=start_time,
             end_time=end_time
         )
@@ -176,19 +233,18 @@ def create_custom_scenario():
         system = DeconflictionSystem(safety_buffer=safety_buffer)
         
         # Add simulated flights
-        num_sims = int(input("\nNumber of simulated drones (0-5): "))
+        if not bulk:
+            num_sims = int(input("\nNumber of simulated drones (0-5): "))
+            sim_rows = []
+            for i in range(num_sims):
+                print(f"\n--- Simulated Drone {i+1} ---")
+                sim_rows.append(
+                    _read_floats("Start X Y Z: ", 3)
+                    + _read_floats("End X Y Z: ", 3)
+                    + _read_floats("Start and end time: ", 2)
+                )
         
-        for i in range(num_sims):
-            print(f"\n--- Simulated Drone {i+1} ---")
-            x1 = float(input("Start X: "))
-            y1 = float(input("Start Y: "))
-            z1 = float(input("Start Z: "))
-            x2 = float(input("End X: "))
-            y2 = float(input("End Y: "))
-            z2 = float(input("End Z: "))
-            t1 = float(input("Start time: "))
-            t2 = float(input("End time: "))
-            
+        for i, (x1, y1, z1, x2, y2, z2, t1, t2) in enumerate(sim_rows):
             sim = Mission(
                 drone_id=f"SIM-{i+1:03d}",
                 waypoints=[Waypoint(x1, y1, z1), Waypoint(x2, y2, z2)],
@@ -242,13 +298,12 @@ def view_documentation():
             print(f"VIEWING: {filename}")
             print('='*70 + "\n")
             with open(filename, 'r') as f:
-                content = f.read()
-                # Show first 50 lines
-                lines = content.split('\n')
-                for i, line in enumerate(lines[:50]):
-                    print(line)
-                if len(lines) > 50:
-                    print(f"\n... ({len(lines) - 50} more lines)")
+                # Show first 50 lines; the rest is only counted, never stored
+                for line in itertools.islice(f, 50):
+                    print(line, end='')
+                remaining = sum(1 for _ in f)
+                if remaining:
+                    print(f"\n... ({remaining} more lines)")
                     print(f"\nOpen {filename} in a text editor to view the complete file.")
         else:
             print(f"❌ File {filename} not found in current directory.")
@@ -260,11 +315,9 @@ def main():
     
     print_banner()
     
-    # Check dependencies
-    try:
-        import numpy
-        import matplotlib
-    except ImportError:
+    # Check dependencies without importing them
+    missing = [name for name in ('numpy', 'matplotlib') if importlib.util.find_spec(name) is None]
+    if missing:
         print("❌ Missing dependencies!")
         print("\nPlease install required packages:")
         print("  pip install -r requirements.txt\n")
@@ -3,13 +3,35 @@ Comprehensive test suite for UAV deconfliction system
 Tests various conflict scenarios and edge cases
 """
 
+import contextlib
+import io
+import os
+import tempfile
 import unittest
+from importlib.util import find_spec
+from unittest import mock
 import numpy as np
-from typing import List
+import matplotlib.pyplot as plt
+from PIL import Image, ImageSequence
 
 from uav_deconfliction_main import (
     Waypoint, Mission, DeconflictionSystem, Conflict
 )
+import uav_kernels
+from uav_kernels import sample_missions
+import uav_visualization
+from uav_visualization import DeconflictionVisualizer
+
+
+def setUpModule():
+    """Compile (or load cached) Numba kernels once, before any test is timed"""
+    system = DeconflictionSystem(safety_buffer=50.0, time_resolution=1.0)
+    system.check_spatial_conflict(Waypoint(0, 0, 0), Waypoint(0, 0, 0))
+    system.add_simulated_flight(Mission("WARMUP-SIM", [Waypoint(0, 0), Waypoint(10, 0)], 0, 1))
+    primary = Mission("WARMUP", [Waypoint(0, 0), Waypoint(10, 0)], 0, 1)
+    system.verify_mission(primary)
+    system.verify_mission(primary, max_conflicts=1)
+    sample_missions([primary], np.zeros(1))
 
 
 class TestWaypoint(unittest.TestCase):
@@ -25,6 +47,13 @@ class TestWaypoint(unittest.TestCase):
         wp = Waypoint(10.0, 20.0)
         self.assertEqual(wp.z, 0.0)
     
+    def test_waypoint_immutable_tuple(self):
+        wp = Waypoint(1.0, 2.0, 3.0)
+        x, y, z = wp
+        self.assertEqual((x, y, z), (1.0, 2.0, 3.0))
+        with self.assertRaises(AttributeError):
+            wp.x = 5.0
+    
     def test_distance_calculation(self):
         wp1 = Waypoint(0, 0, 0)
         wp2 = Waypoint(3, 4, 0)
@@ -62,14 +91,174 @@ class TestMission(unittest.TestCase):
             end_time=10
         )
         self.assertEqual(mission.total_distance(), 7.0)
+    
+    def test_mission_from_array(self):
+        listed = Mission(
+            drone_id="TEST-001",
+            waypoints=[Waypoint(0, 0), Waypoint(3, 0), Waypoint(3, 4)],
+            start_time=0,
+            end_time=10
+        )
+        arrayed = Mission(
+            drone_id="TEST-001",
+            waypoints=np.array([[0, 0], [3, 0], [3, 4]]),
+            start_time=0,
+            end_time=10
+        )
+        self.assertEqual(arrayed.waypoints, listed.waypoints)
+        np.testing.assert_array_equal(listed.coords_array, [[0, 0, 0], [3, 0, 0], [3, 4, 0]])
+        self.assertEqual(arrayed.total_distance(), 7.0)
+        np.testing.assert_array_equal(arrayed.sample_trajectory([0, 5, 10]),
+                                      listed.sample_trajectory([0, 5, 10]))
+        
+        with self.assertRaises(ValueError):
+            Mission("TEST-002", np.zeros((3, 4)), 0, 10)
+    
+    def test_sample_missions_matches_sample_trajectory(self):
+        missions = [
+            Mission("TEST-001", [Waypoint(0, 0), Waypoint(100, 0)], 0, 10),
+            Mission("TEST-002", [Waypoint(0, 0, 10), Waypoint(3, 4, 10), Waypoint(3, 4, 10),
+                                 Waypoint(3, 4, 50)], 5, 25),
+            Mission("TEST-003", [Waypoint(5, 5, 5)], 2, 8),
+        ]
+        times = np.linspace(-1, 30, 63)
+        
+        positions = sample_missions(missions, times)
+        self.assertEqual(positions.shape, (len(times), len(missions), 3))
+        for m, mission in enumerate(missions):
+            np.testing.assert_allclose(positions[:, m], mission.sample_trajectory(times),
+                                       atol=1e-9, equal_nan=True)
+    
+    def test_total_distance_degenerate_paths(self):
+        hover = Mission(
+            drone_id="TEST-001",
+            waypoints=[Waypoint(5, 5, 5)],
+            start_time=0,
+            end_time=10
+        )
+        repeated = Mission(
+            drone_id="TEST-002",
+            waypoints=[Waypoint(0, 0), Waypoint(3, 4), Waypoint(3, 4)],
+            start_time=0,
+            end_time=10
+        )
+        self.assertEqual(hover.total_distance(), 0.0)
+        self.assertEqual(repeated.total_distance(), 5.0)
+    
+    def test_edits_rebuild_cached_geometry(self):
+        mission = Mission("TEST-001", [Waypoint(0, 0), Waypoint(100, 0)], 0, 10)
+        with self.assertRaises(AttributeError):
+            mission.waypoints.append(Waypoint(100, 100))
+        
+        mission.waypoints = mission.waypoints + (Waypoint(100, 100),)
+        self.assertEqual(mission.total_distance(), 200.0)
+        np.testing.assert_allclose(mission.sample_trajectory([5, 10]), [[100, 0, 0], [100, 100, 0]])
+        
+        mission.end_time = 20
+        np.testing.assert_allclose(mission.sample_trajectory([10, 20]), [[100, 0, 0], [100, 100, 0]])
+        
+        coords = np.array([[0, 0, 50], [0, 300, 50]], dtype=np.float64)
+        mission.waypoints = coords
+        self.assertIsInstance(mission.waypoints[0], Waypoint)
+        self.assertEqual(mission.total_distance(), 300.0)
+        np.testing.assert_array_equal(mission.coords_array, coords)
+        np.testing.assert_array_equal(mission.bounds, [[0, 0, 50], [0, 300, 50]])
+        
+        # The cached array is a read-only copy of the caller's
+        coords[1, 1] = 0
+        self.assertEqual(mission.coords_array[1, 1], 300)
+        with self.assertRaises(ValueError):
+            mission.coords_array[0, 0] = 1
+
+
+class TestKernels(unittest.TestCase):
+    """Test that the conflict-scan backends agree with the NumPy scan"""
+    
+    @classmethod
+    def setUpClass(cls):
+        rng = np.random.default_rng(0)
+        cls.sims = [
+            Mission(f"SIM-{i:03d}", rng.uniform(0, 300, (rng.integers(1, 5), 3)),
+                    start_time=rng.uniform(0, 20), end_time=rng.uniform(30, 60))
+            for i in range(40)
+        ]
+        primary = Mission("PRIMARY", [Waypoint(0, 0, 0), Waypoint(300, 300, 300)], 5, 50)
+        cls.times = np.linspace(0, 60, 121)
+        cls.primary_positions = primary.sample_trajectory(cls.times)
+        cls.radius = 60.0
+    
+    def _expected(self, planar):
+        sq_dists = uav_kernels._scan_conflicts_numpy(self.primary_positions, self.sims, self.times, planar)
+        sim_idx, t_idx = np.nonzero(sq_dists < self.radius * self.radius)
+        return sim_idx, t_idx, sq_dists[sim_idx, t_idx]
+    
+    def _assert_hits_equal(self, actual, expected):
+        self.assertGreater(len(expected[0]), 0)
+        np.testing.assert_array_equal(actual[0], expected[0])
+        np.testing.assert_array_equal(actual[1], expected[1])
+        np.testing.assert_allclose(actual[2], expected[2], rtol=1e-9)
+    
+    def test_numpy_fallbacks_match_default_backend(self):
+        # Default backend (the Numba kernels when Numba is installed)
+        scans = [uav_kernels.scan_conflicts(self.primary_positions, self.sims, self.times, planar)
+                 for planar in (False, True)]
+        sim_positions = uav_kernels.sample_missions(self.sims, self.times)
+        buf2 = self.radius * self.radius
+        first_hits = [uav_kernels.any_within(self.primary_positions, sim_positions[:, s], buf2)
+                      for s in range(len(self.sims))]
+        self.assertTrue(any(i >= 0 for i in first_hits))
+        self.assertTrue(any(i < 0 for i in first_hits))
+        
+        with mock.patch.multiple(uav_kernels, NUMBA_AVAILABLE=False, PARALLEL_MIN_SIMS=10**9):
+            for planar, scan in zip((False, True), scans):
+                with self.subTest(planar=planar):
+                    np.testing.assert_allclose(
+                        uav_kernels.scan_conflicts(self.primary_positions, self.sims, self.times, planar),
+                        scan, rtol=1e-9)
+            np.testing.assert_allclose(uav_kernels.sample_missions(self.sims, self.times),
+                                       sim_positions, atol=1e-9, equal_nan=True)
+            self.assertEqual(
+                [uav_kernels.any_within(self.primary_positions, sim_positions[:, s], buf2)
+                 for s in range(len(self.sims))],
+                first_hits)
+    
+    def test_threaded_scan_matches_numpy_scan(self):
+        threaded = mock.Mock(wraps=uav_kernels._scan_conflicts_threaded)
+        with mock.patch.multiple(uav_kernels, NUMBA_AVAILABLE=False, PARALLEL_MIN_SIMS=2,
+                                 _scan_conflicts_threaded=threaded), \
+                mock.patch.object(uav_kernels.os, 'cpu_count', return_value=3):
+            for planar in (False, True):
+                with self.subTest(planar=planar):
+                    actual = uav_kernels.find_conflicts(self.primary_positions, self.sims,
+                                                        self.times, self.radius, planar)
+                    self._assert_hits_equal(actual, self._expected(planar))
+        self.assertEqual(threaded.call_count, 2)
+    
+    @unittest.skipUnless(find_spec('scipy'), "SciPy is not installed")
+    def test_kdtree_scan_matches_numpy_scan(self):
+        kdtree = mock.Mock(wraps=uav_kernels._find_conflicts_kdtree)
+        with mock.patch.multiple(uav_kernels, USE_KDTREE=True, NUMBA_AVAILABLE=False,
+                                 _find_conflicts_kdtree=kdtree):
+            for planar in (False, True):
+                with self.subTest(planar=planar):
+                    actual = uav_kernels.find_conflicts(self.primary_positions, self.sims,
+                                                        self.times, self.radius, planar)
+                    self._assert_hits_equal(actual, self._expected(planar))
+        self.assertEqual(kdtree.call_count, 2)
 
 
 class TestDeconflictionSystem(unittest.TestCase):
     """Test core deconfliction functionality"""
     
+    @classmethod
+    def setUpClass(cls):
+        """Set up test fixtures shared by every test in the class"""
+        cls._system = DeconflictionSystem(safety_buffer=50.0, time_resolution=1.0)
+    
     def setUp(self):
-        """Set up test fixtures"""
-        self.system = DeconflictionSystem(safety_buffer=50.0, time_resolution=1.0)
+        # Only the flight list is mutated by tests
+        self.system = self._system
+        self.system.simulated_flights.clear()
     
     def test_system_initialization(self):
         self.assertEqual(self.system.safety_buffer, 50.0)
@@ -86,48 +275,27 @@ class TestDeconflictionSystem(unittest.TestCase):
         self.system.add_simulated_flight(mission)
         self.assertEqual(len(self.system.simulated_flights), 1)
     
-    def test_interpolate_position_start(self):
+    def test_interpolate_position_vectorized(self):
         mission = Mission(
             drone_id="TEST-001",
             waypoints=[Waypoint(0, 0, 0), Waypoint(100, 0, 0)],
             start_time=0,
             end_time=10
         )
-        pos = self.system.interpolate_position(mission, 0)
-        self.assertIsNotNone(pos)
-        self.assertAlmostEqual(pos.x, 0)
-    
-    def test_interpolate_position_end(self):
-        mission = Mission(
-            drone_id="TEST-001",
-            waypoints=[Waypoint(0, 0, 0), Waypoint(100, 0, 0)],
-            start_time=0,
-            end_time=10
-        )
-        pos = self.system.interpolate_position(mission, 10)
-        self.assertIsNotNone(pos)
-        self.assertAlmostEqual(pos.x, 100)
-    
-    def test_interpolate_position_middle(self):
-        mission = Mission(
-            drone_id="TEST-001",
-            waypoints=[Waypoint(0, 0, 0), Waypoint(100, 0, 0)],
-            start_time=0,
-            end_time=10
-        )
-        pos = self.system.interpolate_position(mission, 5)
-        self.assertIsNotNone(pos)
-        self.assertAlmostEqual(pos.x, 50, places=1)
-    
-    def test_interpolate_position_outside_time(self):
-        mission = Mission(
-            drone_id="TEST-001",
-            waypoints=[Waypoint(0, 0), Waypoint(100, 0)],
-            start_time=10,
-            end_time=20
-        )
-        pos = self.system.interpolate_position(mission, 5)
-        self.assertIsNone(pos)
+        times = np.array([0, 5, 10, -1])
+        positions = self.system.interpolate_positions(mission, times)
+        
+        self.assertEqual(positions.shape, (4, 3))
+        np.testing.assert_allclose(positions[:3], [[0, 0, 0], [50, 0, 0], [100, 0, 0]])
+        self.assertTrue(np.isnan(positions[3]).all())
+        
+        # The scalar API agrees row for row; a NaN row is None
+        for t, row in zip(times, positions):
+            pos = self.system.interpolate_position(mission, t)
+            if np.isnan(row).all():
+                self.assertIsNone(pos)
+            else:
+                np.testing.assert_allclose([pos.x, pos.y, pos.z], row)
     
     def test_spatial_conflict_detection(self):
         wp1 = Waypoint(0, 0, 0)
@@ -138,157 +306,230 @@ class TestDeconflictionSystem(unittest.TestCase):
         wp1 = Waypoint(0, 0, 0)
         wp2 = Waypoint(60, 0, 0)  # Outside 50m buffer
         self.assertFalse(self.system.check_spatial_conflict(wp1, wp2))
-
-
-class TestConflictScenarios(unittest.TestCase):
-    """Test various conflict scenarios"""
     
-    def setUp(self):
-        self.system = DeconflictionSystem(safety_buffer=50.0, time_resolution=0.5)
-    
-    def test_no_conflict_parallel_paths(self):
-        """Test parallel paths with sufficient separation"""
-        primary = Mission(
-            drone_id="PRIMARY",
-            waypoints=[Waypoint(0, 0, 100), Waypoint(100, 0, 100)],
-            start_time=0,
-            end_time=10
-        )
+    def test_verify_mission_sees_primary_edits(self):
+        self.system.add_simulated_flight(Mission(
+            "SIM-001", [Waypoint(50, -50, 100), Waypoint(50, 50, 100)], 0, 10
+        ))
+        primary = Mission("TEST-001", [Waypoint(0, 500, 100), Waypoint(100, 500, 100)], 0, 10)
+        self.assertTrue(self.system.verify_mission(primary)[0])
         
-        simulated = Mission(
-            drone_id="SIM-001",
-            waypoints=[Waypoint(0, 100, 100), Waypoint(100, 100, 100)],
-            start_time=0,
-            end_time=10
-        )
-        
-        self.system.add_simulated_flight(simulated)
-        is_safe, conflicts = self.system.verify_mission(primary)
-        
-        self.assertTrue(is_safe)
-        self.assertEqual(len(conflicts), 0)
+        # Moved onto the crossing flight's path after the first check
+        primary.waypoints = [Waypoint(0, 0, 100), Waypoint(100, 0, 100)]
+        self.assertFalse(self.system.verify_mission(primary)[0])
+        self.assertFalse(self.system.verify_mission(primary, max_conflicts=1)[0])
     
-    def test_conflict_crossing_paths(self):
-        """Test crossing paths at same time"""
+    def test_closest_approach_crossing(self):
         primary = Mission(
-            drone_id="PRIMARY",
-            waypoints=[Waypoint(0, 0, 100), Waypoint(100, 0, 100)],
+            drone_id="TEST-001",
+            waypoints=[Waypoint(0, 0, 0), Waypoint(100, 0, 0)],
             start_time=0,
             end_time=10
         )
-        
-        simulated = Mission(
-            drone_id="SIM-001",
-            waypoints=[Waypoint(50, -50, 100), Waypoint(50, 50, 100)],
+        crossing = Mission(
+            drone_id="TEST-002",
+            waypoints=[Waypoint(50, -50, 10), Waypoint(50, 50, 10)],
             start_time=0,
             end_time=10
         )
-        
-        self.system.add_simulated_flight(simulated)
-        is_safe, conflicts = self.system.verify_mission(primary)
-        
-        self.assertFalse(is_safe)
-        self.assertGreater(len(conflicts), 0)
+        distance, t = self.system.closest_approach(primary, crossing)
+        self.assertAlmostEqual(distance, 10.0)
+        self.assertAlmostEqual(t, 5.0)
     
-    def test_no_conflict_different_times(self):
-        """Test same path but different time windows"""
+    def test_closest_approach_no_time_overlap(self):
         primary = Mission(
-            drone_id="PRIMARY",
-            waypoints=[Waypoint(0, 0, 100), Waypoint(100, 0, 100)],
+            drone_id="TEST-001",
+            waypoints=[Waypoint(0, 0), Waypoint(100, 0)],
             start_time=0,
             end_time=10
         )
-        
-        simulated = Mission(
-            drone_id="SIM-001",
-            waypoints=[Waypoint(0, 0, 100), Waypoint(100, 0, 100)],
+        later = Mission(
+            drone_id="TEST-002",
+            waypoints=[Waypoint(0, 0), Waypoint(100, 0)],
             start_time=20,
             end_time=30
         )
-        
-        self.system.add_simulated_flight(simulated)
-        is_safe, conflicts = self.system.verify_mission(primary)
-        
-        self.assertTrue(is_safe)
-        self.assertEqual(len(conflicts), 0)
+        self.assertIsNone(self.system.closest_approach(primary, later))
     
-    def test_no_conflict_different_altitudes(self):
-        """Test same XY path but different altitudes"""
+    def test_broadphase_prefilter(self):
         primary = Mission(
-            drone_id="PRIMARY",
+            drone_id="TEST-001",
             waypoints=[Waypoint(0, 0, 100), Waypoint(100, 0, 100)],
             start_time=0,
             end_time=10
         )
+        later = Mission("LATER", [Waypoint(0, 0, 100), Waypoint(100, 0, 100)], 20, 30)
+        above = Mission("ABOVE", [Waypoint(0, 0, 200), Waypoint(100, 0, 200)], 0, 10)
+        crossing = Mission("CROSSING", [Waypoint(50, -50, 100), Waypoint(50, 50, 100)], 0, 10)
+        # Boxes 40m apart in y: inside the buffer, so it must be kept
+        beside = Mission("BESIDE", [Waypoint(0, 40, 100), Waypoint(100, 40, 100)], 0, 10)
         
-        simulated = Mission(
-            drone_id="SIM-001",
-            waypoints=[Waypoint(0, 0, 200), Waypoint(100, 0, 200)],
-            start_time=0,
-            end_time=10
-        )
+        for flight in (later, above):
+            self.assertEqual(self.system._broadphase(primary, [flight]), [])
+        for flight in (crossing, beside):
+            self.assertEqual(self.system._broadphase(primary, [flight]), [flight])
         
-        self.system.add_simulated_flight(simulated)
-        is_safe, conflicts = self.system.verify_mission(primary)
-        
-        self.assertTrue(is_safe)
-        self.assertEqual(len(conflicts), 0)
+        flights = [later, above, crossing, beside]
+        self.assertEqual(self.system._broadphase(primary, flights), [crossing, beside])
+        self.assertEqual(self.system._broadphase(primary, []), [])
+
+
+class TestConflictScenarios(unittest.TestCase):
+    """Test various conflict scenarios"""
     
-    def test_conflict_vertical_separation_insufficient(self):
-        """Test insufficient vertical separation"""
-        primary = Mission(
+    @classmethod
+    def setUpClass(cls):
+        cls._system = DeconflictionSystem(safety_buffer=50.0, time_resolution=0.5)
+        
+        # Missions are immutable once built, so tests share these fixtures
+        cls.PRIMARY = Mission(
             drone_id="PRIMARY",
             waypoints=[Waypoint(0, 0, 100), Waypoint(100, 0, 100)],
             start_time=0,
             end_time=10
         )
-        
-        simulated = Mission(
-            drone_id="SIM-001",
-            waypoints=[Waypoint(0, 0, 120), Waypoint(100, 0, 120)],  # Only 20m vertical sep
-            start_time=0,
-            end_time=10
-        )
-        
-        self.system.add_simulated_flight(simulated)
-        is_safe, conflicts = self.system.verify_mission(primary)
-        
-        self.assertFalse(is_safe)
-        self.assertGreater(len(conflicts), 0)
-    
-    def test_multiple_conflicts(self):
-        """Test detection of multiple conflicts"""
-        primary = Mission(
+        cls.PRIMARY_LONG = Mission(
             drone_id="PRIMARY",
             waypoints=[Waypoint(0, 0, 100), Waypoint(200, 0, 100)],
             start_time=0,
             end_time=20
         )
+        # (name, simulated flight, expected is_safe) checked against PRIMARY
+        cls.SCENARIOS = [
+            # Parallel paths with sufficient separation
+            ("parallel_paths", Mission(
+                drone_id="SIM-001",
+                waypoints=[Waypoint(0, 100, 100), Waypoint(100, 100, 100)],
+                start_time=0,
+                end_time=10
+            ), True),
+            # Crossing paths at same time
+            ("crossing_paths", Mission(
+                drone_id="SIM-001",
+                waypoints=[Waypoint(50, -50, 100), Waypoint(50, 50, 100)],
+                start_time=0,
+                end_time=10
+            ), False),
+            # Same path but different time windows
+            ("different_times", Mission(
+                drone_id="SIM-001",
+                waypoints=[Waypoint(0, 0, 100), Waypoint(100, 0, 100)],
+                start_time=20,
+                end_time=30
+            ), True),
+            # Same XY path but different altitudes
+            ("different_altitudes", Mission(
+                drone_id="SIM-001",
+                waypoints=[Waypoint(0, 0, 200), Waypoint(100, 0, 200)],
+                start_time=0,
+                end_time=10
+            ), True),
+            # Insufficient vertical separation
+            ("vertical_separation_insufficient", Mission(
+                drone_id="SIM-001",
+                waypoints=[Waypoint(0, 0, 120), Waypoint(100, 0, 120)],  # Only 20m vertical sep
+                start_time=0,
+                end_time=10
+            ), False),
+        ]
         
+        # Two flights crossing PRIMARY_LONG at x=50 and x=150
+        cls.CROSSERS = tuple(
+            Mission(
+                drone_id=f"SIM-{i + 1:03d}",
+                waypoints=[Waypoint(x, -50, 100), Waypoint(x, 50, 100)],
+                start_time=0,
+                end_time=20
+            )
+            for i, x in enumerate([50, 150])
+        )
+    
+    def setUp(self):
+        self.system = self._system
+        self.system.simulated_flights.clear()
+    
+    def test_scenarios(self):
+        """Test single-intruder scenarios against PRIMARY"""
+        for name, simulated, expected_safe in self.SCENARIOS:
+            with self.subTest(name=name):
+                self.system.simulated_flights.clear()
+                self.system.add_simulated_flight(simulated)
+                is_safe, conflicts = self.system.verify_mission(self.PRIMARY)
+                
+                self.assertEqual(is_safe, expected_safe)
+                if expected_safe:
+                    self.assertEqual(len(conflicts), 0)
+                else:
+                    self.assertGreater(len(conflicts), 0)
+    
+    def test_multiple_conflicts(self):
+        """Test detection of multiple conflicts"""
         # Add multiple conflicting flights
-        sim1 = Mission(
+        for sim in self.CROSSERS:
+            self.system.add_simulated_flight(sim)
+        
+        is_safe, conflicts = self.system.verify_mission(self.PRIMARY_LONG)
+        
+        self.assertFalse(is_safe)
+        # Should have conflicts with both drones
+        conflicting_drones = set(c.conflicting_drone for c in conflicts)
+        self.assertEqual(len(conflicting_drones), 2)
+    
+    def test_conflict_between_samples(self):
+        """Test a crossing that falls between two coarse time samples"""
+        system = DeconflictionSystem(safety_buffer=50.0, time_resolution=10.0)
+        simulated = Mission(
             drone_id="SIM-001",
             waypoints=[Waypoint(50, -50, 100), Waypoint(50, 50, 100)],
             start_time=0,
-            end_time=20
+            end_time=10
         )
         
-        sim2 = Mission(
-            drone_id="SIM-002",
-            waypoints=[Waypoint(150, -50, 100), Waypoint(150, 50, 100)],
-            start_time=0,
-            end_time=20
-        )
+        system.add_simulated_flight(simulated)
+        is_safe, conflicts = system.verify_mission(self.PRIMARY)
         
-        self.system.add_simulated_flight(sim1)
-        self.system.add_simulated_flight(sim2)
+        self.assertFalse(is_safe)
+        self.assertEqual(len(conflicts), 1)
+        self.assertAlmostEqual(conflicts[0].time, 5.0)
+        self.assertAlmostEqual(conflicts[0].distance, 0.0)
+    
+    def test_max_conflicts_caps_report(self):
+        """Test early exit once the requested number of conflicts is found"""
+        for sim in self.CROSSERS:
+            self.system.add_simulated_flight(sim)
         
-        is_safe, conflicts = self.system.verify_mission(primary)
+        _, all_conflicts = self.system.verify_mission(self.PRIMARY_LONG)
+        is_safe, conflicts = self.system.verify_mission(self.PRIMARY_LONG, max_conflicts=1)
         
         self.assertFalse(is_safe)
-        # Should have conflicts with both drones
-        conflicting_drones = set(c.conflicting_drone for c in conflicts)
-        self.assertEqual(len(conflicting_drones), 2)
+        self.assertEqual(len(conflicts), 1)
+        self.assertEqual(conflicts[0], all_conflicts[0])
+        
+        for cap in (0, -1):
+            with self.assertRaises(ValueError):
+                self.system.verify_mission(self.PRIMARY_LONG, max_conflicts=cap)
+    
+    def test_exact_buffer_distance_is_safe(self):
+        """Test a flight exactly one buffer away, with and without max_conflicts"""
+        # Parallel track 40 m across and 30 m up: always exactly 50 m away
+        self.system.add_simulated_flight(Mission(
+            drone_id="SIM-001",
+            waypoints=[Waypoint(0, 40, 130), Waypoint(100, 40, 130)],
+            start_time=0,
+            end_time=10
+        ))
+    
+        for cap in (None, 1):
+            with self.subTest(max_conflicts=cap):
+                is_safe, conflicts = self.system.verify_mission(self.PRIMARY, max_conflicts=cap)
+                self.assertTrue(is_safe)
+                self.assertEqual(len(conflicts), 0)
+    
+        # A real conflict behind it is still found by the yes/no query
+        self.system.add_simulated_flight(self.CROSSERS[0])
+        is_safe, conflicts = self.system.verify_mission(self.PRIMARY, max_conflicts=1)
+        self.assertFalse(is_safe)
+        self.assertEqual(conflicts[0].conflicting_drone, self.CROSSERS[0].drone_id)
     
     def test_edge_case_single_waypoint(self):
         """Test mission with single waypoint (hovering)"""
@@ -351,6 +592,255 @@ class TestConflictReporting(unittest.TestCase):
         self.assertIn("DENIED", summary)
         self.assertIn("SIM-001", summary)
         self.assertIn("50", summary)
+    
+    def test_conflict_set_behaves_like_list(self):
+        system = DeconflictionSystem(safety_buffer=50.0, time_resolution=1.0)
+        primary = Mission(
+            drone_id="PRIMARY",
+            waypoints=[Waypoint(0, 0, 100), Waypoint(100, 0, 100)],
+            start_time=0,
+            end_time=10
+        )
+        system.add_simulated_flight(Mission(
+            drone_id="SIM-001",
+            waypoints=[Waypoint(50, -50, 100), Waypoint(50, 50, 100)],
+            start_time=0,
+            end_time=10
+        ))
+        
+        _, conflicts = system.verify_mission(primary)
+        conflict_list = conflicts.to_conflict_list()
+        
+        self.assertEqual(len(conflicts), len(conflict_list))
+        self.assertEqual(list(conflicts), conflict_list)
+        self.assertEqual(conflicts[::2], conflict_list[::2])
+        self.assertIsInstance(conflicts[0], Conflict)
+        self.assertEqual(conflicts[0].conflicting_drone, "SIM-001")
+        self.assertEqual(conflicts[0].primary_drone, "PRIMARY")
+    
+    def test_conflict_summary_matches_for_set_and_list(self):
+        system = DeconflictionSystem(safety_buffer=50.0, time_resolution=1.0)
+        primary = Mission(
+            drone_id="PRIMARY",
+            waypoints=[Waypoint(0, 0, 100), Waypoint(200, 0, 100)],
+            start_time=0,
+            end_time=20
+        )
+        for i, x in enumerate([50, 150]):
+            system.add_simulated_flight(Mission(
+                drone_id=f"SIM-{i + 1:03d}",
+                waypoints=[Waypoint(x, -50, 100), Waypoint(x, 50, 100)],
+                start_time=0,
+                end_time=20
+            ))
+        
+        _, conflicts = system.verify_mission(primary)
+        summary = system.get_conflict_summary(conflicts)
+        
+        self.assertEqual(summary, system.get_conflict_summary(list(conflicts)))
+        self.assertLess(summary.index("SIM-001"), summary.index("SIM-002"))
+        self.assertIn("more conflicts", summary)
+
+
+class _AggTestCase(unittest.TestCase):
+    """Renders with the non-interactive Agg backend, restoring the previous one afterwards"""
+    
+    @classmethod
+    def setUpClass(cls):
+        cls._previous_backend = plt.get_backend()
+        plt.switch_backend('Agg')
+    
+    @classmethod
+    def tearDownClass(cls):
+        plt.switch_backend(cls._previous_backend)
+
+
+class TestAnimationOutput(_AggTestCase):
+    """Test the frame selection and GIF encoding behind the 4D animation"""
+    
+    def test_changed_frames_keeps_visible_changes(self):
+        # Drone A creeps along x; drone B takes off at frame 2
+        positions = np.zeros((7, 2, 3))
+        positions[:, 0, 0] = [0.0, 0.1, 0.2, 0.3, 2.0, 2.0, 2.0]
+        active = np.ones((7, 2), dtype=bool)
+        active[:2, 1] = False   # B takes off at frame 2
+        active[6, 0] = False    # A lands at frame 6
+        conflict_mask = np.zeros((7, 1), dtype=bool)
+        conflict_mask[5:] = True
+        
+        keep = DeconflictionVisualizer._changed_frames(positions, active, conflict_mask, pixel=1.0)
+        
+        # Sub-pixel motion (frames 1 and 3) is dropped; takeoff, the 1.7 px
+        # jump, the conflict appearing and the landing are kept
+        np.testing.assert_array_equal(keep, [0, 2, 4, 5, 6])
+    
+    def test_write_gif_round_trip(self):
+        white, red, blue = (255, 255, 255), (255, 0, 0), (0, 0, 255)
+        frames = []
+        for step in range(3):
+            frame = np.full((12, 16, 4), 255, dtype=np.uint8)
+            frame[2:6, 2 + 4 * step:6 + 4 * step, :3] = red
+            frame[8:10, 1:3, :3] = blue if step == 2 else white
+            frames.append(frame)
+        holds = [1, 3, 2]
+        key_colors = np.array([white, red, blue]) / 255
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, 'test.gif')
+            DeconflictionVisualizer._write_gif(zip(frames, holds), filename, 10, key_colors)
+            
+            with Image.open(filename) as gif:
+                self.assertEqual(gif.n_frames, len(frames))
+                for expected, hold, decoded in zip(frames, holds, ImageSequence.Iterator(gif)):
+                    # Transparent pixels show the previous frame through
+                    np.testing.assert_array_equal(np.asarray(decoded.convert('RGB')), expected[..., :3])
+                    self.assertEqual(decoded.info['duration'], 100 * hold)
+
+    
+    def test_hover_animation_holds_only_when_asked(self):
+        system = DeconflictionSystem(safety_buffer=50.0, time_resolution=1.0)
+        hover = Mission("PRIMARY", [Waypoint(50, 50, 100)], 0, 100)
+        visualizer = DeconflictionVisualizer(system)
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            for hold, expected_frames, readout in ((False, 50, 'Time: 100.0s'),
+                                                   (True, 1, 'Time: 0.0-100.0s')):
+                with self.subTest(hold_static_frames=hold):
+                    fig = plt.figure()
+                    self.addCleanup(plt.close, fig)
+                    filename = os.path.join(tmp, f'hover_{hold}.gif')
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        visualizer.create_4d_animation(hover, filename=filename, fps=5, fig=fig,
+                                                       dpi=10, figsize=(4, 3),
+                                                       hold_static_frames=hold)
+                    
+                    with Image.open(filename) as gif:
+                        durations = [frame.info['duration'] for frame in ImageSequence.Iterator(gif)]
+                    self.assertEqual(len(durations), expected_frames)
+                    self.assertEqual(sum(durations), 10000)
+                    # The readout of the last drawn frame covers the end of the timeline
+                    self.assertTrue(fig.texts[0].get_text().endswith(readout))
+
+    
+    def test_output_format_is_never_swapped(self):
+        system = DeconflictionSystem(safety_buffer=50.0, time_resolution=1.0)
+        hover = Mission("PRIMARY", [Waypoint(50, 50, 100)], 0, 100)
+        visualizer = DeconflictionVisualizer(system)
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            # A video without ffmpeg is an error, not a silent GIF
+            filename = os.path.join(tmp, 'hover.mp4')
+            with mock.patch.object(uav_visualization.writers, 'is_available', return_value=False):
+                with self.assertRaises(RuntimeError):
+                    visualizer.create_4d_animation(hover, filename=filename)
+            self.assertEqual(os.listdir(tmp), [])
+            
+            # A long GIF stays a GIF, thinned to GIF_MAX_FRAMES
+            filename = os.path.join(tmp, 'hover.gif')
+            with mock.patch.object(uav_visualization, 'GIF_MAX_FRAMES', 10), \
+                    contextlib.redirect_stdout(io.StringIO()):
+                written = visualizer.create_4d_animation(hover, filename=filename, fps=5,
+                                                         dpi=10, figsize=(4, 3))
+            self.assertEqual(written, filename)
+            with Image.open(filename) as gif:
+                self.assertEqual(gif.n_frames, 10)
+
+    
+    @unittest.skipUnless(os.name == 'posix', "needs a shell script as a fake ffmpeg")
+    def test_write_video_reports_early_ffmpeg_exit(self):
+        frames = [(np.zeros((200, 200, 4), dtype=np.uint8), 20)]
+        with tempfile.TemporaryDirectory() as tmp:
+            fake_ffmpeg = os.path.join(tmp, 'ffmpeg')
+            with open(fake_ffmpeg, 'w') as script:
+                script.write("#!/bin/sh\necho 'unknown encoder' >&2\nexit 1\n")
+            os.chmod(fake_ffmpeg, 0o755)
+            
+            ffmpeg = mock.Mock()
+            ffmpeg.bin_path.return_value = fake_ffmpeg
+            with mock.patch.object(uav_visualization, 'writers', {'ffmpeg': ffmpeg}):
+                with self.assertRaisesRegex(RuntimeError, 'unknown encoder'):
+                    DeconflictionVisualizer._write_video(iter(frames), os.path.join(tmp, 'out.mp4'),
+                                                         10, (200, 200))
+
+
+class TestFigureReuse(_AggTestCase):
+    """Test redrawing into a figure from an earlier plot"""
+    
+    @staticmethod
+    def _render(fig) -> np.ndarray:
+        fig.canvas.draw()
+        return np.array(fig.canvas.buffer_rgba())
+    
+    def test_reused_3d_figure_matches_fresh_figure(self):
+        wide = DeconflictionSystem(safety_buffer=50.0, time_resolution=1.0)
+        wide.add_simulated_flight(Mission("SIM-001", [Waypoint(50, 150, 100), Waypoint(50, 250, 100),
+                                                      Waypoint(350, 250, 100)], 0, 80))
+        wide.add_simulated_flight(Mission("SIM-002", [Waypoint(200, 300, 110)], 30, 50))
+        wide_primary = Mission("PRIMARY", [Waypoint(0, 200, 100), Waypoint(200, 300, 100),
+                                           Waypoint(400, 200, 100)], 0, 80)
+        
+        # Smaller limits, so laying out with the stale projection misplaces the axes
+        narrow = DeconflictionSystem(safety_buffer=50.0, time_resolution=1.0)
+        narrow.add_simulated_flight(Mission("SIM-003", [Waypoint(150, -40, 100), Waypoint(150, 40, 100)], 10, 25))
+        narrow_primary = Mission("PRIMARY", [Waypoint(0, 0, 100), Waypoint(300, 0, 100)], 0, 30)
+        _, conflicts = narrow.verify_mission(narrow_primary)
+        
+        reused, fresh = plt.figure(dpi=30), plt.figure(dpi=30)
+        self.addCleanup(plt.close, reused)
+        self.addCleanup(plt.close, fresh)
+        DeconflictionVisualizer(wide).plot_3d_scenario(wide_primary, show=False, fig=reused)
+        self._render(reused)  # as if the first plot was saved or shown
+        DeconflictionVisualizer(narrow).plot_3d_scenario(narrow_primary, conflicts, show=False, fig=reused)
+        DeconflictionVisualizer(narrow).plot_3d_scenario(narrow_primary, conflicts, show=False, fig=fresh)
+        
+        np.testing.assert_array_equal(self._render(reused), self._render(fresh))
+
+
+
+class TestDatashaderBackend(_AggTestCase):
+    """Test rasterized conflict markers in the 2D view"""
+    
+    @unittest.skipUnless(find_spec('datashader'), "datashader is not installed")
+    def test_dense_conflicts_are_rasterized(self):
+        system = DeconflictionSystem(safety_buffer=50.0, time_resolution=1.0)
+        system.add_simulated_flight(Mission("SIM-001", [Waypoint(50, -50, 100), Waypoint(50, 50, 100)], 0, 10))
+        primary = Mission("PRIMARY", [Waypoint(0, 0, 100), Waypoint(100, 0, 100)], 0, 10)
+        _, conflicts = system.verify_mission(primary)
+        locations = np.array([c.location for c in conflicts])
+        
+        fig = plt.figure(dpi=30)
+        self.addCleanup(plt.close, fig)
+        with mock.patch.object(uav_visualization, 'DENSE_POINTS', 1):
+            _, ax = DeconflictionVisualizer(system, backend='datashader').plot_2d_scenario(
+                primary, conflicts, show=False, fig=fig)
+        
+        # One image in place of the markers, spanning the conflicts, with red pixels
+        self.assertEqual(len(ax.images), 1)
+        x0, x1, y0, y1 = ax.images[0].get_extent()
+        self.assertLessEqual(x0, locations[:, 0].min())
+        self.assertGreaterEqual(x1, locations[:, 0].max())
+        self.assertLessEqual(y0, locations[:, 1].min())
+        self.assertGreaterEqual(y1, locations[:, 1].max())
+        raster = np.asarray(ax.images[0].get_array())
+        drawn = raster[..., 3] > 0
+        self.assertTrue(drawn.any())
+        np.testing.assert_array_equal(raster[drawn][:, :3], [[255, 0, 0]] * drawn.sum())
+        
+        # The legend entry survives as an empty scatter
+        self.assertIn('Conflicts', [text.get_text() for text in ax.get_legend().get_texts()])
+
+
+TEST_CASES = (
+    TestWaypoint,
+    TestMission,
+    TestKernels,
+    TestDeconflictionSystem,
+    TestConflictScenarios,
+    TestConflictReporting,
+    TestAnimationOutput,
+    TestFigureReuse,
+    TestDatashaderBackend,
+)
 
 
 def run_all_tests():
@@ -359,11 +849,8 @@ def run_all_tests():
     suite = unittest.TestSuite()
     
     # Add all test classes
-    suite.addTests(loader.loadTestsFromTestCase(TestWaypoint))
-    suite.addTests(loader.loadTestsFromTestCase(TestMission))
-    suite.addTests(loader.loadTestsFromTestCase(TestDeconflictionSystem))
-    suite.addTests(loader.loadTestsFromTestCase(TestConflictScenarios))
-    suite.addTests(loader.loadTestsFromTestCase(TestConflictReporting))
+    for test_case in TEST_CASES:
+        suite.addTests(loader.loadTestsFromTestCase(test_case))
     
     # Run tests
     runner = unittest.TextTestRunner(verbosity=2)
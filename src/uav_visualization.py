@@ -3,119 +3,235 @@ Visualization module for UAV deconfliction system
 Creates 2D, 3D, and 4D (3D + time) visualizations
 """
 
+import importlib.util
+import subprocess
 import numpy as np
 import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation, PillowWriter
+from matplotlib.animation import writers
+from matplotlib.colors import to_rgba_array
+from PIL import Image
 from mpl_toolkits.mplot3d import Axes3D
 from typing import List, Tuple
-import matplotlib.patches as patches
+from matplotlib.collections import EllipseCollection, LineCollection
+from matplotlib.lines import Line2D
+from mpl_toolkits.mplot3d.art3d import Line3DCollection
 
-from uav_deconfliction_main import Mission, Waypoint, DeconflictionSystem, Conflict
+from uav_deconfliction_main import Mission, DeconflictionSystem, Conflict
+from uav_kernels import sample_missions
+
+# GIFs keep every frame in memory until the end; longer animations are
+# thinned to this many frames (write .mp4 for the full frame rate)
+GIF_MAX_FRAMES = 200
+
+# Extensions written by streaming frames to ffmpeg
+VIDEO_EXTENSIONS = ('.mp4', '.webm')
+
+# Animation frames are rendered far smaller than the 300 dpi static PNGs:
+# (10, 7.5) inches at 80 dpi gives 800x600 frames
+ANIMATION_DPI = 80
+ANIMATION_FIGSIZE = (10, 7.5)
+
+# Bounds on the number of 4D animation frames
+MIN_FRAMES = 30
+MAX_FRAMES = 600
+
+# With the datashader backend, 2D conflict sets at least this large are
+# rasterized into one image instead of drawn as individual markers
+DENSE_POINTS = 10_000
+
+# Resolution of a rasterized point layer
+RASTER_SIZE = (1200, 800)
 
 
 class DeconflictionVisualizer:
     """Handles all visualization for the deconfliction system"""
     
-    def __init__(self, system: DeconflictionSystem):
+    def __init__(self, system: DeconflictionSystem, backend: str = 'mpl'):
+        """
+        Args:
+            system: Deconfliction system whose flights are drawn
+            backend: 'mpl' draws every marker with matplotlib; 'datashader'
+                rasterizes dense 2D conflict sets (falls back to 'mpl' when
+                datashader is not installed)
+        """
+        if backend not in ('mpl', 'datashader'):
+            raise ValueError(f"Unknown backend {backend!r}; expected 'mpl' or 'datashader'")
+        if backend == 'datashader' and importlib.util.find_spec('datashader') is None:
+            print("datashader not found; drawing with matplotlib")
+            backend = 'mpl'
+        
         self.system = system
+        self.backend = backend
         self.colors = ['red', 'blue', 'green', 'orange', 'purple', 'cyan']
     
     def plot_2d_scenario(self, primary: Mission, conflicts: List[Conflict] = None,
-                        filename: str = None, show: bool = True):
-        """Create 2D top-down view of flight paths"""
-        fig, ax = plt.subplots(figsize=(12, 8))
+                        filename: str = None, show: bool = True, fig=None):
+        """
+        Create 2D top-down view of flight paths
+        
+        Args:
+            fig: Existing figure to clear and draw into instead of creating one
+        """
+        fig = self._prepare_figure(fig, (12, 8))
+        ax = fig.add_subplot(111)
         
         # Plot primary mission
         self._plot_mission_2d(ax, primary, 'red', 'Primary', linewidth=3)
         
-        # Plot simulated flights
-        for i, sim in enumerate(self.system.simulated_flights):
-            color = self.colors[i % len(self.colors)]
-            self._plot_mission_2d(ax, sim, color, sim.drone_id, linewidth=2, alpha=0.7)
+        # Plot simulated flights as one line collection
+        sims = self.system.simulated_flights
+        colors = [self.colors[i % len(self.colors)] for i in range(len(sims))]
+        sim_handles = self._plot_flights(ax, sims, colors, linewidth=2, alpha=0.7, markersize=6)
         
         # Mark conflicts
         if conflicts:
-            conflict_x = [c.location.x for c in conflicts]
-            conflict_y = [c.location.y for c in conflicts]
-            ax.scatter(conflict_x, conflict_y, c='red', s=200, marker='X',
-                      edgecolors='black', linewidths=2, label='Conflicts', zorder=10)
+            _, locations = self._conflict_arrays(conflicts)
+            conflict_style = dict(c='red', s=200, marker='X', edgecolors='black',
+                                  linewidths=2, label='Conflicts', zorder=10)
+            if self.backend == 'datashader' and len(locations) >= DENSE_POINTS:
+                # Empty scatter keeps the legend entry
+                self._shade_points(ax, locations[:, :2], 'red', zorder=10)
+                ax.scatter([], [], **conflict_style)
+            else:
+                ax.scatter(locations[:, 0], locations[:, 1], **conflict_style)
             
-            # Draw safety circles at conflict points
-            for conflict in conflicts[::max(1, len(conflicts)//5)]:  # Show subset
-                circle = patches.Circle(
-                    (conflict.location.x, conflict.location.y),
-                    self.system.safety_buffer,
-                    color='red', fill=False, linestyle='--', alpha=0.3
-                )
-                ax.add_patch(circle)
+            # Draw safety circles at conflict points (subset), as one collection
+            centers = locations[::max(1, len(conflicts)//5), :2]
+            diameters = np.full(len(centers), 2 * self.system.safety_buffer)
+            circles = EllipseCollection(
+                diameters, diameters, np.zeros(len(centers)), units='xy',
+                offsets=centers, offset_transform=ax.transData,
+                facecolors='none', edgecolors='red', linestyles='--', alpha=0.3
+            )
+            ax.add_collection(circles, autolim=False)
+            
+            # Autoscale to the circles' full extent, as individual patches would
+            radius = self.system.safety_buffer
+            ax.update_datalim(np.concatenate((centers - radius, centers + radius)))
+            ax.autoscale_view()
         
         ax.set_xlabel('X Position (m)', fontsize=12)
         ax.set_ylabel('Y Position (m)', fontsize=12)
         ax.set_title('UAV Flight Paths - Top View', fontsize=14, fontweight='bold')
-        ax.legend(loc='best')
+        handles, _ = ax.get_legend_handles_labels()
+        ax.legend(handles=handles[:1] + sim_handles + handles[1:], loc='best')
         ax.grid(True, alpha=0.3)
         ax.set_aspect('equal')
         
-        plt.tight_layout()
+        fig.tight_layout()
         
         if filename:
-            plt.savefig(filename, dpi=300, bbox_inches='tight')
+            fig.savefig(filename, dpi=300, bbox_inches='tight')
         if show:
             plt.show()
         
         return fig, ax
     
     def plot_3d_scenario(self, primary: Mission, conflicts: List[Conflict] = None,
-                        filename: str = None, show: bool = True):
-        """Create 3D visualization of flight paths"""
-        fig = plt.figure(figsize=(14, 10))
+                        filename: str = None, show: bool = True, fig=None):
+        """
+        Create 3D visualization of flight paths
+        
+        Args:
+            fig: Existing figure to clear and draw into instead of creating one
+        """
+        fig = self._prepare_figure(fig, (14, 10))
         ax = fig.add_subplot(111, projection='3d')
         
         # Plot primary mission
         self._plot_mission_3d(ax, primary, 'red', 'Primary', linewidth=3)
         
-        # Plot simulated flights
-        for i, sim in enumerate(self.system.simulated_flights):
-            color = self.colors[i % len(self.colors)]
-            self._plot_mission_3d(ax, sim, color, sim.drone_id, linewidth=2, alpha=0.7)
+        # Plot simulated flights as one line collection
+        sims = self.system.simulated_flights
+        colors = [self.colors[i % len(self.colors)] for i in range(len(sims))]
+        sim_handles = self._plot_flights(ax, sims, colors, linewidth=2, alpha=0.7, markersize=5)
         
         # Mark conflicts
         if conflicts:
-            conflict_x = [c.location.x for c in conflicts]
-            conflict_y = [c.location.y for c in conflicts]
-            conflict_z = [c.location.z for c in conflicts]
-            ax.scatter(conflict_x, conflict_y, conflict_z, c='red', s=200, marker='X',
+            _, locations = self._conflict_arrays(conflicts)
+            ax.scatter(locations[:, 0], locations[:, 1], locations[:, 2], c='red', s=200, marker='X',
                       edgecolors='black', linewidths=2, label='Conflicts', zorder=10)
         
         ax.set_xlabel('X Position (m)', fontsize=11)
         ax.set_ylabel('Y Position (m)', fontsize=11)
         ax.set_zlabel('Altitude (m)', fontsize=11)
         ax.set_title('UAV Flight Paths - 3D View', fontsize=14, fontweight='bold')
-        ax.legend(loc='best')
+        handles, _ = ax.get_legend_handles_labels()
+        ax.legend(handles=handles[:1] + sim_handles + handles[1:], loc='best')
         ax.grid(True, alpha=0.3)
         
-        plt.tight_layout()
+        fig.tight_layout()
         
         if filename:
-            plt.savefig(filename, dpi=300, bbox_inches='tight')
+            fig.savefig(filename, dpi=300, bbox_inches='tight')
         if show:
             plt.show()
         
         return fig, ax
     
     def create_4d_animation(self, primary: Mission, conflicts: List[Conflict] = None,
-                           filename: str = 'deconfliction_4d.gif', fps: int = 20):
-        """Create 4D animation (3D space + time)"""
+                           filename: str = 'deconfliction_4d.gif', fps: int = 20, fig=None,
+                           dpi: float = ANIMATION_DPI,
+                           figsize: Tuple[float, float] = ANIMATION_FIGSIZE,
+                           hold_static_frames: bool = False):
+        """
+        Create 4D animation (3D space + time)
+        
+        The timeline gets between MIN_FRAMES and MAX_FRAMES frames. With
+        hold_static_frames, frames in which nothing moves by at least a pixel
+        are not redrawn; the previous image is held instead, and its time
+        readout shows the whole span it is held for.
+        
+        .mp4 and .webm files are streamed to ffmpeg frame by frame. A GIF of
+        more than GIF_MAX_FRAMES frames is thinned to GIF_MAX_FRAMES frames
+        at the same playback length.
+        
+        Args:
+            fig: Existing figure to clear and draw into instead of creating one
+                (left open afterwards; a figure created here is closed)
+            dpi: Resolution of the rendered frames
+            figsize: Figure size in inches; frames are figsize * dpi pixels
+            hold_static_frames: Skip redrawing frames without visible motion
+        
+        Returns:
+            filename. Frames are rendered straight into the file, so unlike
+            earlier versions no FuncAnimation is returned
+        
+        Raises:
+            RuntimeError: If filename is a video and ffmpeg is not available
+        """
         
         # Determine time range
         all_missions = [primary] + self.system.simulated_flights
         min_time = min(m.start_time for m in all_missions)
         max_time = max(m.end_time for m in all_missions)
+        num_frames = min(MAX_FRAMES, max(MIN_FRAMES, int((max_time - min_time) * fps / 10)))
+        
+        # Check the output format before any rendering
+        video = filename.lower().endswith(VIDEO_EXTENSIONS)
+        if video and not writers.is_available('ffmpeg'):
+            raise RuntimeError(f"ffmpeg is required to write {filename} but was not found")
+        if not video and num_frames > GIF_MAX_FRAMES:
+            print(f"GIF thinned to {GIF_MAX_FRAMES} of {num_frames} frames; write .mp4 for all of them")
+            fps = fps * GIF_MAX_FRAMES / num_frames
+            num_frames = GIF_MAX_FRAMES
         
         # Create time points
-        time_points = np.linspace(min_time, max_time, int((max_time - min_time) * fps / 10))
+        time_points = np.linspace(min_time, max_time, num_frames)
         
-        fig = plt.figure(figsize=(16, 12))
+        # Every drone position for every frame, (F, M, 3) with NaN when not flying,
+        # and which drones are flying in each frame as an (F, M) mask
+        positions = sample_missions(all_missions, time_points)
+        active = ~np.isnan(positions[..., 0])
+        
+        # Conflicts shown in each frame, as an (F, C) mask
+        conflict_times, conflict_locations = self._conflict_arrays(conflicts)
+        conflict_mask = np.abs(conflict_times[None, :] - time_points[:, None]) < 1.0
+        
+        own_figure = fig is None
+        fig = self._prepare_figure(fig, figsize)
+        fig.set_dpi(dpi)
+        fig.set_facecolor('white')
         
         # Create subplots
         ax1 = fig.add_subplot(221, projection='3d')  # 3D view
@@ -123,42 +239,238 @@ class DeconflictionVisualizer:
         ax3 = fig.add_subplot(223)  # Side view (XZ)
         ax4 = fig.add_subplot(224)  # Front view (YZ)
         
-        # Initialize plot limits
-        self._set_plot_limits([ax1, ax2, ax3, ax4], all_missions)
+        # Static content (paths, labels, limits) is drawn once; frames only
+        # move the drone and conflict markers
+        artists, drone_style = self._init_4d_axes(ax1, ax2, ax3, ax4, all_missions)
+        self._set_plot_limits([ax1, ax2, ax3, ax4], self._plot_limits(all_missions))
+        title = fig.suptitle('', fontsize=16, fontweight='bold')
+        # At animation sizes the default spacing lets labels and titles
+        # collide; the top strip is left for the suptitle
+        fig.tight_layout(rect=(0, 0, 1, 0.94))
+        
+        # Shown conflicts are packed into a reused buffer, like the drone positions
+        conflict_buffer = np.empty(conflict_locations.shape)
+        
+        # Frames to draw, and the last timeline frame each one is shown until
+        if hold_static_frames:
+            keep = self._changed_frames(positions, active, conflict_mask,
+                                        self._pixel_size([ax2, ax3, ax4]))
+        else:
+            keep = np.arange(num_frames)
+        shown_until = np.append(keep[1:], num_frames) - 1
         
         def update(frame):
-            t = time_points[frame]
-            
-            # Clear all axes
-            ax1.clear()
-            ax2.clear()
-            ax3.clear()
-            ax4.clear()
-            
-            # Plot trajectories and current positions
-            self._plot_4d_frame(ax1, ax2, ax3, ax4, primary, all_missions, t, conflicts)
-            
-            # Reset limits
-            self._set_plot_limits([ax1, ax2, ax3, ax4], all_missions)
+            shown = conflict_mask[frame]
+            current_conflicts = np.compress(shown, conflict_locations, axis=0,
+                                            out=conflict_buffer[:np.count_nonzero(shown)])
+            self._update_4d_frame(artists, drone_style, positions[frame], active[frame],
+                                  current_conflicts)
             
-            fig.suptitle(f'UAV Deconfliction - Time: {t:.1f}s', 
-                        fontsize=16, fontweight='bold')
-        
-        anim = FuncAnimation(fig, update, frames=len(time_points), 
-                           interval=1000/fps, repeat=True)
+            # A held frame stands for every time step until the next drawn one
+            last = shown_until[np.searchsorted(keep, frame)]
+            if last > frame:
+                readout = f'{time_points[frame]:.1f}-{time_points[last]:.1f}s'
+            else:
+                readout = f'{time_points[frame]:.1f}s'
+            title.set_text(f'UAV Deconfliction - Time: {readout}')
         
         # Save animation
-        writer = PillowWriter(fps=fps)
-        anim.save(filename, writer=writer)
+        frames = self._blit_frames(fig, list(artists.values()) + [title], update, keep, len(time_points))
+        if video:
+            self._write_video(frames, filename, fps, fig.canvas.get_width_height())
+        else:
+            # Palette colors, the primary and conflict marker colors, and the marker edges
+            key_colors = to_rgba_array([*self.colors, 'red', 'yellow', 'black', 'white'])[:, :3]
+            self._write_gif(frames, filename, fps, key_colors)
+        if own_figure:
+            plt.close(fig)
         print(f"Animation saved to {filename}")
         
-        return anim
+        return filename
+    
+    @staticmethod
+    def _prepare_figure(fig, figsize: Tuple[float, float]):
+        """Clear and resize a reused figure, or create a new one"""
+        if fig is None:
+            return plt.figure(figsize=figsize)
+        fig.clf()
+        fig.set_size_inches(figsize)
+        return fig
+    
+    @staticmethod
+    def _pixel_size(axes) -> float:
+        """Smallest data distance covered by one pixel across the given 2D axes"""
+        sizes = []
+        for ax in axes:
+            (x0, x1), (y0, y1) = ax.get_xlim(), ax.get_ylim()
+            sizes.append(abs(x1 - x0) / ax.bbox.width)
+            sizes.append(abs(y1 - y0) / ax.bbox.height)
+        return min(sizes)
+    
+    @staticmethod
+    def _changed_frames(positions: np.ndarray, active: np.ndarray, conflict_mask: np.ndarray,
+                        pixel: float) -> np.ndarray:
+        """
+        Indices of the frames that differ visibly from the last kept frame
+        
+        A frame is kept when any drone moved at least one pixel since the last
+        kept frame, a drone started or stopped flying, or the set of shown
+        conflicts changed.
+        """
+        keep = [0]
+        for frame in range(1, len(positions)):
+            last = keep[-1]
+            both = active[frame] & active[last]
+            moved = np.linalg.norm(positions[frame, both] - positions[last, both], axis=1)
+            if (np.any(moved >= pixel)
+                    or np.any(active[frame] != active[last])
+                    or np.any(conflict_mask[frame] != conflict_mask[last])):
+                keep.append(frame)
+        return np.array(keep)
+    
+    @staticmethod
+    def _blit_frames(fig, dynamic_artists, update, keep: np.ndarray, num_frames: int):
+        """
+        Render animation frames by blitting the changing artists over a cached background
+        
+        The figure is fully drawn once without the dynamic artists and kept as
+        a bitmap; each kept frame restores that bitmap and draws only the
+        artists update() changed.
+        
+        Args:
+            keep: Sorted indices of the frames to render, starting at 0
+            num_frames: Length of the whole timeline
+        
+        Yields:
+            Tuple of ((H, W, 4) uint8 RGBA view of the canvas, valid until the
+            next frame; number of timeline frames the image is shown for)
+        """
+        for artist in dynamic_artists:
+            artist.set_animated(True)
+        canvas = fig.canvas
+        canvas.draw()
+        background = canvas.copy_from_bbox(fig.bbox)
+        
+        dynamic_artists = sorted(dynamic_artists, key=lambda artist: artist.get_zorder())
+        holds = np.diff(np.append(keep, num_frames))
+        for frame, hold in zip(keep.tolist(), holds.tolist()):
+            update(frame)
+            canvas.restore_region(background)
+            for artist in dynamic_artists:
+                if hasattr(artist, 'do_3d_projection'):
+                    artist.do_3d_projection()
+                (artist.axes or fig).draw_artist(artist)
+            yield np.asarray(canvas.buffer_rgba()), hold
+    
+    @staticmethod
+    def _gif_palette(first_frame: np.ndarray, key_colors: np.ndarray) -> Image.Image:
+        """
+        One palette shared by every frame of a GIF
+        
+        The key plot colors get exact entries, so markers that only appear in
+        later frames keep their color; the remaining entries are fitted to the
+        first frame (background, grid, paths and antialiased edges). At most
+        255 colors are used, leaving an index free for transparency.
+        
+        Args:
+            first_frame: (H, W, 4) uint8 RGBA image
+            key_colors: (K, 3) RGB colors in [0, 1]
+        """
+        keys = np.unique(np.round(np.asarray(key_colors) * 255).astype(np.int16), axis=0)
+        fitted = Image.fromarray(first_frame).convert('RGB').quantize(255 - len(keys))
+        fitted = np.array(fitted.getpalette()[:3 * (255 - len(keys))], dtype=np.int16).reshape(-1, 3)
+        
+        # Pillow maps pixels to palette entries through a coarse color cache, so
+        # fitted entries within a few levels of a key color would capture it
+        # (white would come out as 252 gray)
+        near_key = (np.abs(fitted[:, None] - keys[None]).max(axis=2) <= 8).any(axis=1)
+        entries = np.concatenate((keys, fitted[~near_key]))
+        
+        palette = Image.new('P', (1, 1))
+        palette.putpalette(entries.astype(np.uint8).ravel().tolist())
+        return palette
+    
+    @staticmethod
+    def _write_gif(frames, filename: str, fps: float, key_colors: np.ndarray):
+        """
+        Write (RGBA frame, hold) pairs to a looping GIF; held frames just last longer
+        
+        Frames are mapped onto one shared palette (see _gif_palette) as they
+        arrive, without dithering, so only 8-bit images are kept in memory.
+        Pixels unchanged since the previous frame are written as transparent,
+        which viewers draw by keeping what is already shown.
+        """
+        images, durations = [], []
+        palette = previous = None
+        for frame, hold in frames:
+            if palette is None:
+                palette = DeconflictionVisualizer._gif_palette(frame, key_colors)
+                # The first index past the palette is never produced by quantize
+                entries = palette.getpalette()
+                transparent = len(entries) // 3
+                entries = entries + [255, 255, 255]
+            
+            # Converting the contiguous RGBA buffer in Pillow avoids copying a strided RGB view
+            rgb = Image.fromarray(frame).convert('RGB')
+            image = rgb.quantize(palette=palette, dither=Image.Dither.NONE)
+            indices = np.asarray(image)
+            image.putpalette(entries)
+            if previous is not None:
+                image.paste(transparent, mask=Image.fromarray(indices == previous))
+            previous = indices
+            
+            images.append(image)
+            durations.append(int(1000 * hold / fps))
+        
+        # Pillow's own optimizer would redo the transparency fill pixel by
+        # pixel in Python; with it done here it only crops each frame
+        images[0].save(filename, save_all=True, append_images=images[1:],
+                       duration=durations, loop=0, optimize=False, transparency=transparent)
+    
+    @staticmethod
+    def _write_video(frames, filename: str, fps: float, size: Tuple[int, int]):
+        """
+        Stream (RGBA frame, hold) pairs to ffmpeg as constant-rate raw video
+        
+        Raises:
+            RuntimeError: If ffmpeg fails, with its error output
+        """
+        width, height = size
+        command = [
+            writers['ffmpeg'].bin_path(), '-y', '-loglevel', 'error',
+            '-f', 'rawvideo', '-pix_fmt', 'rgba', '-s', f'{width}x{height}', '-r', str(fps),
+            '-i', 'pipe:',
+        ]
+        if filename.lower().endswith('.mp4'):
+            # h264 in yuv420p plays back nearly everywhere; it needs even
+            # dimensions, which a custom dpi or figsize may not give
+            command += ['-vcodec', 'h264', '-pix_fmt', 'yuv420p',
+                        '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2']
+        command += ['-b:v', '2000k', filename]
+        
+        with subprocess.Popen(command, stdin=subprocess.PIPE, stderr=subprocess.PIPE) as proc:
+            try:
+                for frame, hold in frames:
+                    data = frame.tobytes()
+                    for _ in range(hold):
+                        proc.stdin.write(data)
+                _, errors = proc.communicate()
+            except BrokenPipeError:
+                # ffmpeg exited before reading every frame; its stderr says why
+                errors = proc.stderr.read()
+                proc.wait()
+                try:
+                    proc.stdin.close()
+                except BrokenPipeError:
+                    pass  # the unflushed frame data; the pipe is closed regardless
+        if proc.returncode:
+            raise RuntimeError(f"ffmpeg failed writing {filename}: {errors.decode(errors='replace')}")
     
     def _plot_mission_2d(self, ax, mission: Mission, color: str, label: str,
                         linewidth: int = 2, alpha: float = 1.0):
         """Helper to plot a mission in 2D"""
-        x = [wp.x for wp in mission.waypoints]
-        y = [wp.y for wp in mission.waypoints]
+        coords = mission.coords_array
+        x, y = coords[:, 0], coords[:, 1]
         
         ax.plot(x, y, color=color, linewidth=linewidth, alpha=alpha, 
                label=f'{label} ({mission.start_time:.0f}s-{mission.end_time:.0f}s)',
@@ -173,9 +485,8 @@ class DeconflictionVisualizer:
     def _plot_mission_3d(self, ax, mission: Mission, color: str, label: str,
                         linewidth: int = 2, alpha: float = 1.0):
         """Helper to plot a mission in 3D"""
-        x = [wp.x for wp in mission.waypoints]
-        y = [wp.y for wp in mission.waypoints]
-        z = [wp.z for wp in mission.waypoints]
+        coords = mission.coords_array
+        x, y, z = coords[:, 0], coords[:, 1], coords[:, 2]
         
         ax.plot(x, y, z, color=color, linewidth=linewidth, alpha=alpha,
                label=f'{label} ({mission.start_time:.0f}s-{mission.end_time:.0f}s)',
@@ -187,17 +498,102 @@ class DeconflictionVisualizer:
         ax.scatter(x[-1], y[-1], z[-1], c=color, s=150, marker='^',
                   edgecolors='black', linewidths=2, zorder=5)
     
-    def _plot_4d_frame(self, ax1, ax2, ax3, ax4, primary, all_missions, t, conflicts):
-        """Plot a single frame of the 4D animation"""
-        
-        # Plot all trajectory paths (faded)
-        for mission in all_missions:
-            color = 'red' if mission == primary else 'gray'
+    def _plot_flights(self, ax, missions: List[Mission], colors: List[str],
+                      linewidth: int = 2, alpha: float = 1.0, markersize: float = 6) -> List[Line2D]:
+        """
+        Helper to plot several missions in 2D or 3D with a fixed number of artists
+        
+        All paths go into one line collection, and the waypoint, start and end
+        markers of every mission into one scatter each.
+        
+        Returns:
+            Legend proxy lines, one per mission, styled like _plot_mission_2d
+        """
+        if not missions:
+            return []
+        
+        three_d = hasattr(ax, 'set_zlim')
+        dims = 3 if three_d else 2
+        paths = [m.coords_array[:, :dims] for m in missions]
+        points = np.concatenate(paths)
+        point_colors = list(np.repeat(colors, [len(path) for path in paths]))
+        
+        # Line2D draws at zorder 2; collections default to 1
+        collection_type = Line3DCollection if three_d else LineCollection
+        lines = collection_type(paths, colors=colors, linewidths=linewidth, alpha=alpha, zorder=2)
+        if three_d:
+            ax.add_collection3d(lines)
+        else:
+            ax.add_collection(lines)
+        
+        # Waypoint markers, then start and end
+        marker_style = dict(depthshade=False) if three_d else {}
+        ax.scatter(*points.T, c=point_colors, s=markersize ** 2, marker='o',
+                   alpha=alpha, zorder=2, **marker_style)
+        starts = np.array([path[0] for path in paths])
+        ends = np.array([path[-1] for path in paths])
+        ax.scatter(*starts.T, c=colors, s=150, marker='s',
+                   edgecolors='black', linewidths=2, zorder=5, **marker_style)
+        ax.scatter(*ends.T, c=colors, s=150, marker='^',
+                   edgecolors='black', linewidths=2, zorder=5, **marker_style)
+        
+        return [
+            Line2D([], [], color=color, linewidth=linewidth, alpha=alpha, marker='o',
+                   markersize=markersize, label=f'{m.drone_id} ({m.start_time:.0f}s-{m.end_time:.0f}s)')
+            for m, color in zip(missions, colors)
+        ]
+    
+    @staticmethod
+    def _shade_points(ax, points: np.ndarray, color: str, zorder: float = 1):
+        """Rasterize a dense (N, 2) point set with datashader and show it as one image"""
+        import datashader as ds
+        import datashader.transfer_functions as tf
+        import pandas as pd
+        
+        (x0, y0), (x1, y1) = points.min(axis=0), points.max(axis=0)
+        if x0 == x1:
+            x0, x1 = x0 - 1, x1 + 1
+        if y0 == y1:
+            y0, y1 = y0 - 1, y1 + 1
+        
+        width, height = RASTER_SIZE
+        canvas = ds.Canvas(plot_width=width, plot_height=height, x_range=(x0, x1), y_range=(y0, y1))
+        counts = canvas.points(pd.DataFrame({'x': points[:, 0], 'y': points[:, 1]}), 'x', 'y')
+        image = tf.spread(tf.shade(counts, cmap=[color]), px=2)
+        
+        raster = ax.imshow(image.to_pil(), extent=(x0, x1, y0, y1), origin='upper',
+                           interpolation='nearest', aspect='auto', zorder=zorder)
+        # Keep the usual autoscale margins around the points
+        raster.sticky_edges.x[:] = []
+        raster.sticky_edges.y[:] = []
+    
+    @staticmethod
+    def _conflict_arrays(conflicts) -> Tuple[np.ndarray, np.ndarray]:
+        """Conflict times (C,) and locations (C, 3) as arrays"""
+        if not conflicts:
+            return np.empty(0), np.empty((0, 3))
+        if hasattr(conflicts, 'records'):  # ConflictSet: read the columns directly
+            return conflicts.records['t'], conflicts.records['p']
+        times = np.array([c.time for c in conflicts], dtype=np.float64)
+        locations = np.array([c.location for c in conflicts], dtype=np.float64).reshape(-1, 3)
+        return times, locations
+    
+    def _init_4d_axes(self, ax1, ax2, ax3, ax4, all_missions) -> Tuple[dict, dict]:
+        """
+        Draw the static part of the 4D animation and create the moving markers
+        
+        Returns:
+            Tuple of (dict of the marker collections updated by _update_4d_frame,
+            per-drone marker paths, sizes, colors and a position buffer, with
+            the primary first)
+        """
+        # Plot all trajectory paths (faded); the first mission is the primary
+        for i, mission in enumerate(all_missions):
+            color = 'red' if i == 0 else 'gray'
             alpha = 0.3
             
-            x = [wp.x for wp in mission.waypoints]
-            y = [wp.y for wp in mission.waypoints]
-            z = [wp.z for wp in mission.waypoints]
+            coords = mission.coords_array
+            x, y, z = coords[:, 0], coords[:, 1], coords[:, 2]
             
             # 3D view
             ax1.plot(x, y, z, color=color, alpha=alpha, linewidth=1)
@@ -207,40 +603,6 @@ class DeconflictionVisualizer:
             ax3.plot(x, z, color=color, alpha=alpha, linewidth=1)
             ax4.plot(y, z, color=color, alpha=alpha, linewidth=1)
         
-        # Plot current positions
-        for i, mission in enumerate(all_missions):
-            pos = self.system.interpolate_position(mission, t)
-            if pos:
-                color = 'red' if mission == primary else self.colors[i % len(self.colors)]
-                marker = 'o' if mission == primary else 's'
-                size = 200 if mission == primary else 100
-                
-                # 3D view
-                ax1.scatter([pos.x], [pos.y], [pos.z], c=color, s=size, 
-                           marker=marker, edgecolors='black', linewidths=2)
-                
-                # 2D views
-                ax2.scatter([pos.x], [pos.y], c=color, s=size, 
-                           marker=marker, edgecolors='black', linewidths=2)
-                ax3.scatter([pos.x], [pos.z], c=color, s=size, 
-                           marker=marker, edgecolors='black', linewidths=2)
-                ax4.scatter([pos.y], [pos.z], c=color, s=size, 
-                           marker=marker, edgecolors='black', linewidths=2)
-        
-        # Mark conflicts at current time
-        if conflicts:
-            current_conflicts = [c for c in conflicts if abs(c.time - t) < 1.0]
-            if current_conflicts:
-                for c in current_conflicts:
-                    # 3D view
-                    ax1.scatter([c.location.x], [c.location.y], [c.location.z],
-                               c='red', s=300, marker='X', edgecolors='yellow', 
-                               linewidths=3, zorder=100)
-                    
-                    # 2D views
-                    ax2.scatter([c.location.x], [c.location.y], c='red', s=300,
-                               marker='X', edgecolors='yellow', linewidths=3, zorder=100)
-        
         # Set labels
         ax1.set_title('3D View')
         ax1.set_xlabel('X (m)')
@@ -261,22 +623,113 @@ class DeconflictionVisualizer:
         ax4.set_xlabel('Y (m)')
         ax4.set_ylabel('Z (m)')
         ax4.grid(True, alpha=0.3)
-    
-    def _set_plot_limits(self, axes, missions):
-        """Set consistent plot limits across all axes"""
-        all_x = []
-        all_y = []
-        all_z = []
         
-        for mission in missions:
-            all_x.extend([wp.x for wp in mission.waypoints])
-            all_y.extend([wp.y for wp in mission.waypoints])
-            all_z.extend([wp.z for wp in mission.waypoints])
+        # Moving markers: primary as a large circle, simulated drones as squares
+        # in their palette colors, conflicts (3D and top view) as large X
+        # (no depth shading: every marker keeps its full color, as a lone marker would)
+        artists = {}
+        style = dict(edgecolors='black', linewidths=2)
+        empty_3d = dict(xs=[], ys=[], zs=[], depthshade=False)
+        empty_2d = dict(x=[], y=[])
+        
+        # The 2D views draw every drone from one collection with per-drone
+        # marker paths; Path3DCollection depth-sorts offsets and colors but not
+        # paths, so the 3D view keeps one collection per marker shape
+        artists['primary_3d'] = ax1.scatter(**empty_3d, c='red', s=200, marker='o', **style)
+        artists['sims_3d'] = ax1.scatter(**empty_3d, s=100, marker='s', **style)
+        for name, ax in (('xy', ax2), ('xz', ax3), ('yz', ax4)):
+            artists[f'drones_{name}'] = ax.scatter(**empty_2d, marker='s', **style)
+        for name, ax in (('3d', ax1), ('xy', ax2)):
+            empty = empty_3d if name == '3d' else empty_2d
+            artists[f'conflicts_{name}'] = ax.scatter(**empty, c='red', s=300, marker='X',
+                                                      edgecolors='yellow', linewidths=3, zorder=100)
+        
+        # Fixed per-drone marker paths, sizes and colors, indexed by the active mask
+        # each frame; colors are resolved to RGBA once so frames skip name lookups
+        circle, square = artists['primary_3d'].get_paths()[0], artists['sims_3d'].get_paths()[0]
+        num_sims = len(all_missions) - 1
+        palette = to_rgba_array(self.colors)
+        drone_style = {
+            'paths': [circle] + [square] * num_sims,
+            'sizes': np.array([200] + [100] * num_sims, dtype=np.float64),
+            'colors': np.vstack((to_rgba_array('red'),
+                                 palette[np.arange(1, num_sims + 1) % len(palette)])),
+            'buffer': np.empty((len(all_missions), 3)),
+            # Active mask the marker styles were last set for
+            'shown': None,
+        }
+        return artists, drone_style
+    
+    def _update_4d_frame(self, artists: dict, drone_style: dict, positions: np.ndarray,
+                         active: np.ndarray, current_conflicts: np.ndarray):
+        """
+        Move the 4D animation markers to one frame
+        
+        Args:
+            artists: Marker collections from _init_4d_axes
+            drone_style: Per-drone marker paths, sizes, (M, 4) RGBA colors and (M, 3)
+                position buffer from _init_4d_axes
+            positions: (M, 3) drone positions at this frame, NaN when not flying
+            active: (M,) mask of the drones flying at this frame
+            current_conflicts: (K, 3) locations of conflicts near this frame (the
+                3D markers keep views of it)
+        """
+        # Flying drones are packed into the preallocated buffer; every view
+        # below is a slice of it, so no offset arrays are allocated per frame
+        drones = np.compress(active, positions, axis=0,
+                             out=drone_style['buffer'][:np.count_nonzero(active)])
+        for name, columns in (('xy', slice(0, 2)), ('xz', slice(0, 3, 2)), ('yz', slice(1, 3))):
+            artists[f'drones_{name}'].set_offsets(drones[:, columns])
+        
+        primary = drones[:int(active[0])]
+        sims = drones[int(active[0]):]
+        artists['primary_3d']._offsets3d = (primary[:, 0], primary[:, 1], primary[:, 2])
+        artists['sims_3d']._offsets3d = (sims[:, 0], sims[:, 1], sims[:, 2])
+        
+        # Marker shapes, sizes and colors only change when a drone takes off or lands
+        if drone_style['shown'] is None or np.any(drone_style['shown'] != active):
+            drone_style['shown'] = active
+            paths = [drone_style['paths'][i] for i in np.flatnonzero(active)]
+            sizes = drone_style['sizes'][active]
+            colors = drone_style['colors'][active]
+            for name in ('xy', 'xz', 'yz'):
+                collection = artists[f'drones_{name}']
+                collection.set_paths(paths)
+                collection.set_sizes(sizes)
+                collection.set_facecolor(colors)
+            artists['sims_3d'].set_facecolor(colors[1:] if active[0] else colors)
+        
+        artists['conflicts_3d']._offsets3d = (current_conflicts[:, 0], current_conflicts[:, 1],
+                                              current_conflicts[:, 2])
+        artists['conflicts_xy'].set_offsets(current_conflicts[:, :2])
+    
+    @staticmethod
+    def _plot_limits(missions) -> Tuple[Tuple[float, float], ...]:
+        """
+        Shared axis ranges covering every waypoint plus a margin
+        
+        Returns:
+            Tuple of (x_range, y_range, z_range)
+        """
+        # Each mission caches its waypoint bounding box, so this reduces M boxes
+        # rather than concatenating and scanning every waypoint
+        boxes = np.array([m.bounds for m in missions])
         
         margin = 50
-        x_range = (min(all_x) - margin, max(all_x) + margin)
-        y_range = (min(all_y) - margin, max(all_y) + margin)
-        z_range = (min(all_z) - margin, max(all_z) + margin)
+        low = boxes[:, 0].min(axis=0) - margin
+        high = boxes[:, 1].max(axis=0) + margin
+        return tuple((float(lo), float(hi)) for lo, hi in zip(low, high))
+    
+    @staticmethod
+    def _set_plot_limits(axes, limits: Tuple[Tuple[float, float], ...]):
+        """
+        Set consistent plot limits across all axes
+        
+        Args:
+            axes: 3D and titled 2D axes to apply the limits to
+            limits: (x_range, y_range, z_range) from _plot_limits
+        """
+        x_range, y_range, z_range = limits
         
         for ax in axes:
             if hasattr(ax, 'set_zlim'):  # 3D axis
@@ -305,14 +758,18 @@ if __name__ == "__main__":
     
     viz = DeconflictionVisualizer(system)
     
+    # One figure is reused for all three outputs
+    fig = plt.figure()
+    
     # Create 2D visualization
-    viz.plot_2d_scenario(primary, conflicts, filename='deconfliction_2d.png', show=False)
+    viz.plot_2d_scenario(primary, conflicts, filename='deconfliction_2d.png', show=False, fig=fig)
     print("✓ 2D visualization saved")
     
     # Create 3D visualization
-    viz.plot_3d_scenario(primary, conflicts, filename='deconfliction_3d.png', show=False)
+    viz.plot_3d_scenario(primary, conflicts, filename='deconfliction_3d.png', show=False, fig=fig)
     print("✓ 3D visualization saved")
     
     # Create 4D animation
-    viz.create_4d_animation(primary, conflicts, filename='deconfliction_4d.gif', fps=20)
+    viz.create_4d_animation(primary, conflicts, filename='deconfliction_4d.gif', fps=20, fig=fig,
+                            hold_static_frames=True)
     print("✓ 4D animation saved")